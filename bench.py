@@ -0,0 +1,341 @@
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+import numpy as np
+
+from core.rng import WorldRng
+from entities.obstacle import Obstacle
+from entities.player import Player
+from systems.ai_scheduler import AIScheduler
+from systems.ccd import ObstacleSweeper
+from systems.clustering import ClusterTracker
+from systems.collision_stage import CollisionStage
+from systems.distance_field import DistanceField
+from systems.enemy_manager import spawn_enemies, trigger_attack_clusters
+from systems.enemy_swarm import EnemySwarm
+from systems.hide_spots import HideSpotTable
+from systems.profiler import FrameProfiler, count_steering_calls
+from systems.railgun import Railgun
+from systems.raycast import RayBroadPhase
+from systems.simulation import HEIGHT, WIDTH, Simulation, autopilot
+from systems.spatial_hash import SpatialHash
+from systems.visibility import ShadowMap
+
+ENEMY_COUNTS = (14, 100, 1000, 10000)
+QUICK_ENEMY_COUNTS = (14, 100)
+# Obstacles per million square pixels of arena.
+OBSTACLE_DENSITIES = {"sparse": 4, "medium": 16, "dense": 48}
+STATE_MIXES = ("hide", "attack", "bold", "mixed")
+BENCHMARKS = ("enemy_update", "swarm_update", "swarm_lod", "clusters", "cluster_tracker", "railgun", "collision_stage", "end_to_end")
+
+DT = 1.0 / 60.0
+COLLISION_WARMUP_TICKS = 30
+# Untimed ticks per case for --count-calls.
+COUNT_TICKS = 60
+
+
+class Scenario:
+    def __init__(self, enemies, density, mix, seed=0):
+        self.enemies = enemies
+        self.density = density
+        self.mix = mix
+        self.seed = seed
+
+        # Grow the arena with the enemy count so density stays playable.
+        scale = math.sqrt(max(1.0, enemies / 100.0))
+        self.width = int(WIDTH * scale)
+        self.height = int(HEIGHT * scale)
+
+    @property
+    def name(self):
+        return f"n={self.enemies}/obstacles={self.density}/mix={self.mix}"
+
+    def obstacles(self):
+        rng = WorldRng(self.seed + 1)
+        count = max(1, int(OBSTACLE_DENSITIES[self.density] * self.width * self.height / 1e6))
+        return [
+            Obstacle(rng.uniform(0, self.width), rng.uniform(0, self.height), rng.uniform(20, 80))
+            for _ in range(count)
+        ]
+
+    def build(self):
+        rng = WorldRng(self.seed)
+        obstacles = self.obstacles()
+        enemies = spawn_enemies(self.enemies, self.width, self.height, obstacles, rng=rng)
+        for i, e in enumerate(enemies):
+            state = self.mix if self.mix != "mixed" else STATE_MIXES[i % 3]
+            if state == "attack":
+                e.state = "attack"
+            elif state == "bold":
+                e.is_bold = True
+                e.bold_timer = 1e9
+        player = Player(self.width // 2, self.height // 2)
+        return rng, obstacles, enemies, player
+
+
+def _measure(step, min_time, max_ticks):
+    step()
+    ticks = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while ticks < max_ticks and (ticks == 0 or elapsed < min_time):
+        step()
+        ticks += 1
+        elapsed = time.perf_counter() - start
+    return ticks, elapsed
+
+
+def _count_steering(step, ticks=COUNT_TICKS):
+    # Steering helper calls per tick, from a separate pass so the wrappers
+    # never slow down the timed one.
+    profiler = FrameProfiler(ticks)
+    with count_steering_calls(profiler):
+        for _ in range(ticks):
+            step()
+            profiler.end_frame()
+    return profiler.report()["calls_per_frame"]
+
+
+def bench_enemy_update(sc):
+    _, obstacles, enemies, player = sc.build()
+    grid = SpatialHash()
+    shadows = ShadowMap(obstacles).rebuild(player.position)
+    hide_spots = HideSpotTable(obstacles).rebuild(player.position)
+
+    def step():
+        grid.rebuild(enemies)
+        for e in enemies:
+            e.update(DT, sc.width, sc.height, obstacles, enemies, player, grid, shadows, hide_spots)
+
+    return step
+
+
+def bench_swarm_update(sc):
+    rng, obstacles, enemies, player = sc.build()
+    swarm = EnemySwarm.from_enemies(enemies, rng=rng)
+    shadows = ShadowMap(obstacles).rebuild(player.position)
+    hide_spots = HideSpotTable(obstacles).rebuild(player.position)
+    sweeper = ObstacleSweeper(obstacles)
+    field = DistanceField(obstacles, sc.width, sc.height)
+
+    def step():
+        swarm.update(DT, sc.width, sc.height, obstacles, player, shadows, hide_spots, sweeper, field)
+
+    return step
+
+
+def bench_swarm_lod(sc):
+    rng, obstacles, enemies, player = sc.build()
+    swarm = EnemySwarm.from_enemies(enemies, rng=rng)
+    shadows = ShadowMap(obstacles).rebuild(player.position)
+    hide_spots = HideSpotTable(obstacles).rebuild(player.position)
+    sweeper = ObstacleSweeper(obstacles)
+    field = DistanceField(obstacles, sc.width, sc.height)
+    scheduler = AIScheduler()
+
+    def step():
+        swarm.update(
+            DT, sc.width, sc.height, obstacles, player, shadows, hide_spots, sweeper, field, scheduler=scheduler
+        )
+
+    return step
+
+
+def bench_clusters(sc):
+    _, _, enemies, _ = sc.build()
+    states = [(e.state, e.cluster_id) for e in enemies]
+    grid = SpatialHash()
+
+    def step():
+        for e, (state, cid) in zip(enemies, states):
+            e.state = state
+            e.cluster_id = cid
+        trigger_attack_clusters(enemies, grid=grid.rebuild(enemies))
+
+    return step
+
+
+def bench_cluster_tracker(sc):
+    rng, _, enemies, _ = sc.build()
+    swarm = EnemySwarm.from_enemies(enemies, rng=rng)
+    n = swarm.count
+    states = swarm.state[:n].copy()
+    tracker = ClusterTracker()
+
+    def step():
+        swarm.state[:n] = states
+        tracker.update(swarm)
+
+    return step
+
+
+def bench_railgun(sc):
+    rng, obstacles, enemies, player = sc.build()
+    railgun = Railgun()
+    broadphase = RayBroadPhase(obstacles).set_targets(enemies)
+    angles = rng.uniform_array(-math.pi, math.pi, 64)
+    shot = [0]
+
+    def step():
+        player.angle = angles[shot[0] % len(angles)]
+        shot[0] += 1
+        railgun.fire(player, enemies, obstacles, broadphase)
+
+    return step
+
+
+def bench_collision_stage(sc):
+    rng, obstacles, enemies, player = sc.build()
+    swarm = EnemySwarm.from_enemies(enemies, rng=rng)
+    sweeper = ObstacleSweeper(obstacles)
+    stage = CollisionStage(sweeper)
+    # A fresh spawn has no overlaps, so let the swarm settle for a while,
+    # then integrate one tick without resolving: that leaves the overlaps
+    # a real tick hands the stage. Every step restores and resolves them.
+    for _ in range(COLLISION_WARMUP_TICKS):
+        swarm.update(DT, sc.width, sc.height, obstacles, player, sweeper=sweeper)
+    swarm.update(DT, sc.width, sc.height, obstacles, player, sweeper=sweeper, resolve=False)
+    n = swarm.count
+    position = swarm.position[:n].copy()
+    velocity = swarm.velocity[:n].copy()
+    px, py = player.position.x, player.position.y
+
+    def step():
+        swarm.position[:n] = position
+        swarm.velocity[:n] = velocity
+        player.position.set(px, py)
+        stage.resolve(swarm, player, sc.width, sc.height)
+
+    return step
+
+
+def bench_end_to_end(sc):
+    sim = Simulation(sc.width, sc.height, enemy_count=0, obstacles=sc.obstacles(), seed=sc.seed)
+    _, _, enemies, _ = sc.build()
+    for e in enemies:
+        sim.swarm.add(e)
+
+    # Keeps stepping after a win or loss so every case runs the same loop.
+    def step():
+        sim.step(DT, autopilot(sim))
+
+    return step
+
+
+BENCH_FUNCTIONS = {
+    "enemy_update": bench_enemy_update,
+    "swarm_update": bench_swarm_update,
+    "swarm_lod": bench_swarm_lod,
+    "clusters": bench_clusters,
+    "cluster_tracker": bench_cluster_tracker,
+    "railgun": bench_railgun,
+    "collision_stage": bench_collision_stage,
+    "end_to_end": bench_end_to_end,
+}
+
+
+def run(benchmarks, counts, densities, mixes, min_time, max_ticks, seed, count_calls=False, log=sys.stderr):
+    results = []
+    for bench in benchmarks:
+        for n in counts:
+            for density in densities:
+                for mix in mixes:
+                    sc = Scenario(n, density, mix, seed)
+                    step = BENCH_FUNCTIONS[bench](sc)
+                    ticks, elapsed = _measure(step, min_time, max_ticks)
+                    tps = ticks / elapsed if elapsed > 0 else float("inf")
+                    entry = {
+                        "name": f"{bench}/{sc.name}",
+                        "bench": bench,
+                        "enemies": n,
+                        "density": density,
+                        "mix": mix,
+                        "ticks": ticks,
+                        "seconds": elapsed,
+                        "ticks_per_sec": tps,
+                    }
+                    if count_calls:
+                        entry["calls_per_tick"] = _count_steering(step)
+                    results.append(entry)
+                    print(f"{entry['name']:<60} {tps:>12.1f} ticks/s", file=log)
+    return results
+
+
+def metadata():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline, threshold):
+    # Entries whose ticks/s dropped by more than `threshold` (a fraction).
+    old = {entry["name"]: entry for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        before = old.get(entry["name"])
+        if before is None:
+            continue
+        ratio = entry["ticks_per_sec"] / before["ticks_per_sec"] if before["ticks_per_sec"] else float("inf")
+        if ratio < 1.0 - threshold:
+            regressions.append((entry["name"], before["ticks_per_sec"], entry["ticks_per_sec"], ratio))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seeded benchmarks for the simulation hot paths.")
+    parser.add_argument("--bench", action="append", choices=BENCHMARKS, help="benchmark to run (default: all)")
+    parser.add_argument("--enemies", type=int, action="append", help=f"enemy counts (default: {ENEMY_COUNTS})")
+    parser.add_argument("--density", action="append", choices=tuple(OBSTACLE_DENSITIES), help="obstacle densities")
+    parser.add_argument("--mix", action="append", choices=STATE_MIXES, help="enemy state mixes")
+    parser.add_argument("--quick", action="store_true", help=f"only {QUICK_ENEMY_COUNTS} enemies")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to sample each case for")
+    parser.add_argument("--max-ticks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count-calls", action="store_true", help="also record steering helper calls per tick")
+    parser.add_argument("--out", default="bench_results.json", help="where to save results")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag slowdowns against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown fraction for --compare")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Read the baseline first: --out may well be the same file.
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    counts = args.enemies or (QUICK_ENEMY_COUNTS if args.quick else ENEMY_COUNTS)
+    results = run(
+        args.bench or BENCHMARKS,
+        counts,
+        args.density or tuple(OBSTACLE_DENSITIES),
+        args.mix or STATE_MIXES,
+        args.min_time,
+        args.max_ticks,
+        args.seed,
+        args.count_calls,
+    )
+    report = {"meta": metadata(), "results": results}
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"SLOWER {name}: {before:.1f} -> {after:.1f} ticks/s ({(1 - ratio) * 100:.0f}% slower)")
+        if regressions:
+            sys.exit(1)
+        print(f"no slowdowns beyond {args.threshold * 100:.0f}% against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
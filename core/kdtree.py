@@ -0,0 +1,47 @@
+class KDTree:
+    # Static 2D tree over a fixed point set. Nodes are implicit: the point
+    # list is reordered so that every [lo, hi) range is split at its middle
+    # element along alternating axes.
+    def __init__(self, points):
+        self.points = [(float(x), float(y), i) for i, (x, y) in enumerate(points)]
+        self._build(0, len(self.points), 0)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _build(self, lo, hi, axis):
+        if hi - lo <= 1:
+            return
+        pts = self.points
+        pts[lo:hi] = sorted(pts[lo:hi], key=lambda p: p[axis])
+        mid = (lo + hi) // 2
+        self._build(lo, mid, 1 - axis)
+        self._build(mid + 1, hi, 1 - axis)
+
+    def nearest(self, x, y):
+        # Returns (original index, squared distance) or (None, inf) if empty.
+        pts = self.points
+        best_i = None
+        best_d = float("inf")
+        stack = [(0, len(pts), 0, 0.0)]
+        while stack:
+            lo, hi, axis, bound = stack.pop()
+            if lo >= hi or bound > best_d:
+                continue
+            mid = (lo + hi) // 2
+            px, py, i = pts[mid]
+            dx = x - px
+            dy = y - py
+            d = dx * dx + dy * dy
+            if d < best_d or (d == best_d and i < best_i):
+                best_d = d
+                best_i = i
+            split = dx if axis == 0 else dy
+            if split < 0:
+                near, far = (lo, mid), (mid + 1, hi)
+            else:
+                near, far = (mid + 1, hi), (lo, mid)
+            # Far side first so the near side is searched before it.
+            stack.append((far[0], far[1], 1 - axis, split * split))
+            stack.append((near[0], near[1], 1 - axis, bound))
+        return best_i, best_d
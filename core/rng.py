@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class WorldRng:
+    # One random stream per world. Scalar draws serve the per-entity code,
+    # array draws let the swarm roll for every enemy in a single call, and
+    # spawn() hands out independent child streams for parallel workers.
+    def __init__(self, seed=None):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.generator = np.random.default_rng(self.seed_sequence)
+
+    @property
+    def seed(self):
+        return self.seed_sequence.entropy
+
+    def uniform(self, low, high):
+        return float(self.generator.uniform(low, high))
+
+    def randint(self, low, high):
+        # Inclusive on both ends, like random.randint.
+        return int(self.generator.integers(low, high, endpoint=True))
+
+    def uniform_array(self, low, high, size=None):
+        return self.generator.uniform(low, high, size)
+
+    def integers_array(self, low, high, size=None):
+        return self.generator.integers(low, high, size, endpoint=True)
+
+    def spawn(self, n):
+        return [WorldRng(child) for child in self.seed_sequence.spawn(n)]
+
+    def get_state(self):
+        return self.generator.bit_generator.state
+
+    def set_state(self, state):
+        self.generator.bit_generator.state = state
+
+
+_default = None
+
+
+def default_rng():
+    # Shared fallback for callers that don't pass a world stream.
+    global _default
+    if _default is None:
+        _default = WorldRng()
+    return _default
@@ -1,10 +1,20 @@
-from math import hypot
+from math import hypot, sqrt
 
 class Vector2:
+    __slots__ = ("x", "y")
+
     def __init__(self, x=0, y=0):
         self.x = float(x)
         self.y = float(y)
 
+    def copy(self):
+        return Vector2(self.x, self.y)
+
+    def set(self, x, y):
+        self.x = x
+        self.y = y
+        return self
+
     def add(self, v):
         return Vector2(self.x + v.x, self.y + v.y)
 
@@ -14,9 +24,20 @@ class Vector2:
     def mul(self, s):
         return Vector2(self.x * s, self.y * s)
 
+    def dot(self, v):
+        return self.x * v.x + self.y * v.y
+
     def length(self):
         return hypot(self.x, self.y)
 
+    def length_sq(self):
+        return self.x * self.x + self.y * self.y
+
+    def dist_sq(self, v):
+        dx = self.x - v.x
+        dy = self.y - v.y
+        return dx * dx + dy * dy
+
     def normalized(self):
         l = self.length()
         if l == 0:
@@ -28,3 +49,42 @@ class Vector2:
         if l == 0 or l <= max_len:
             return Vector2(self.x, self.y)
         return self.normalized().mul(max_len)
+
+    # In-place variants: mutate self and return it so calls can be chained.
+
+    def iadd(self, v):
+        self.x += v.x
+        self.y += v.y
+        return self
+
+    def isub(self, v):
+        self.x -= v.x
+        self.y -= v.y
+        return self
+
+    def imul(self, s):
+        self.x *= s
+        self.y *= s
+        return self
+
+    def iadd_scaled(self, v, s):
+        self.x += v.x * s
+        self.y += v.y * s
+        return self
+
+    def normalize_ip(self):
+        l_sq = self.x * self.x + self.y * self.y
+        if l_sq == 0:
+            return self
+        inv = 1.0 / sqrt(l_sq)
+        self.x *= inv
+        self.y *= inv
+        return self
+
+    def limit_ip(self, max_len):
+        l_sq = self.x * self.x + self.y * self.y
+        if l_sq > max_len * max_len:
+            s = max_len / sqrt(l_sq)
+            self.x *= s
+            self.y *= s
+        return self
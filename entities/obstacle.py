@@ -1,16 +1,20 @@
-import pygame
 from core.vector2 import Vector2
 from core.collider import CircleCollider
 
+OBSTACLE_COLOR = (140, 140, 180)
+
+
 class Obstacle:
     def __init__(self, x, y, radius):
         self.collider = CircleCollider(x, y, radius)
         self.collider.position = Vector2(x, y)
 
     def draw(self, screen):
+        import pygame
+
         pygame.draw.circle(
             screen,
-            (140, 140, 180),
+            OBSTACLE_COLOR,
             (int(self.collider.position.x), int(self.collider.position.y)),
             self.collider.radius
         )
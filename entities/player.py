@@ -1,4 +1,3 @@
-import pygame
 from math import atan2, cos, sin
 
 from core.collider import CircleCollider
@@ -16,43 +15,35 @@ class Player:
         self.collider = CircleCollider(x, y, radius)
         self.collider.position = self.position
 
-    def update(self, dt, keys, mouse_pos):
-        direction = Vector2()
+    def update(self, dt, move, aim):
+        direction = Vector2(move[0], move[1])
+        self.position.iadd_scaled(direction.normalize_ip(), self.speed * dt)
 
-        if keys[pygame.K_w]:
-            direction.y -= 1
-        if keys[pygame.K_s]:
-            direction.y += 1
-        if keys[pygame.K_a]:
-            direction.x -= 1
-        if keys[pygame.K_d]:
-            direction.x += 1
-
-        velocity = direction.normalized().mul(self.speed * dt)
-        self.position = self.position.add(velocity)
-        self.collider.position = self.position
-
-        mx, my = mouse_pos
+        mx, my = aim
         self.angle = atan2(my - self.position.y, mx - self.position.x)
 
         if self.shoot_cooldown > 0:
             self.shoot_cooldown = max(0, self.shoot_cooldown - dt)
 
-    def draw(self, screen):
-        p = self.position
+    def draw(self, screen, at=None, angle=None):
+        import pygame
+
+        p = self.position if at is None else Vector2(at[0], at[1])
         r = self.collider.radius
+        if angle is None:
+            angle = self.angle
 
-        tip = (p.x + cos(self.angle) * r, p.y + sin(self.angle) * r)
+        tip = (p.x + cos(angle) * r, p.y + sin(angle) * r)
         left = (
-            p.x + cos(self.angle + 2.5) * r * 0.8,
-            p.y + sin(self.angle + 2.5) * r * 0.8,
+            p.x + cos(angle + 2.5) * r * 0.8,
+            p.y + sin(angle + 2.5) * r * 0.8,
         )
         right = (
-            p.x + cos(self.angle - 2.5) * r * 0.8,
-            p.y + sin(self.angle - 2.5) * r * 0.8,
+            p.x + cos(angle - 2.5) * r * 0.8,
+            p.y + sin(angle - 2.5) * r * 0.8,
         )
 
-        pygame.draw.polygon(screen, (255, 220, 120), [tip, left, right])
+        return pygame.draw.polygon(screen, (255, 220, 120), [tip, left, right])
 
     def get_tip(self):
         r = self.collider.radius
@@ -0,0 +1,108 @@
+import argparse
+import itertools
+import sys
+import time
+
+from systems.episode_farm import EpisodeFarm, EpisodeSpec, FarmStats, params_key, random_layout, run_episode
+from systems.simulation import HEIGHT, WIDTH
+
+
+def parse_param(text):
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"expected name=v1,v2,... got {text!r}")
+    return name, [float(v) for v in values.split(",")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run MobSurvival episodes without a display.")
+    parser.add_argument("--episodes", type=int, default=100, help="episodes per parameter combination")
+    parser.add_argument("--enemies", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first episode; episode i uses seed + i")
+    parser.add_argument("--dt", type=float, default=1.0 / 60.0, help="fixed simulation step in seconds")
+    parser.add_argument("--max-time", type=float, default=120.0, help="simulated seconds before an episode times out")
+    parser.add_argument("--width", type=int, default=WIDTH)
+    parser.add_argument("--height", type=int, default=HEIGHT)
+    parser.add_argument("--random-layout", action="store_true", help="give every episode its own obstacle layout")
+    parser.add_argument(
+        "--param",
+        type=parse_param,
+        action="append",
+        default=[],
+        metavar="NAME=V1,V2",
+        help="sweep an enemy parameter such as hide_weight; repeat to build a grid",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="worker processes; 0 uses every core")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    return parser.parse_args(argv)
+
+
+def build_specs(args):
+    names = [name for name, _ in args.param]
+    grids = [values for _, values in args.param]
+    for combo in itertools.product(*grids):
+        params = dict(zip(names, combo))
+        for i in range(args.episodes):
+            seed = args.seed + i
+            layout = random_layout(seed, args.width, args.height) if args.random_layout else None
+            yield EpisodeSpec(
+                seed,
+                enemy_count=args.enemies,
+                layout=layout,
+                enemy_params=params,
+                width=args.width,
+                height=args.height,
+                dt=args.dt,
+                max_time=args.max_time,
+            )
+
+
+def format_summary(stats, wall_time=None):
+    s = stats.as_dict()
+    line = (
+        f"episodes={s['episodes']} wins={s['wins']} losses={s['losses']} timeouts={s['timeouts']} "
+        f"win_rate={s['win_rate']:.3f} mean_survival={s['mean_survival']:.2f}s mean_kills={s['mean_kills']:.2f}"
+    )
+    if wall_time:
+        line += f" ticks_per_sec={s['ticks'] / wall_time:.0f}"
+    return line
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out = sys.stdout if args.quiet else sys.stderr
+    start = time.perf_counter()
+
+    def report(record):
+        if not args.quiet:
+            params = ";".join(f"{k}={v}" for k, v in sorted(record["enemy_params"].items()))
+            print(
+                f"{record['seed']},{params},{record['outcome']},"
+                f"{record['survival_time']:.3f},{record['kills']},{record['ticks']}"
+            )
+
+    if not args.quiet:
+        print("seed,params,outcome,survival_time,kills,ticks")
+
+    if args.workers == 1:
+        totals = FarmStats()
+        by_params = {}
+        for spec in build_specs(args):
+            record = run_episode(spec)
+            totals.add(record)
+            by_params.setdefault(params_key(record["enemy_params"]), FarmStats()).add(record)
+            report(record)
+    else:
+        farm = EpisodeFarm(workers=args.workers or None)
+        totals, by_params = farm.run(build_specs(args), on_result=report)
+
+    wall_time = time.perf_counter() - start
+    if len(by_params) > 1:
+        for key, stats in sorted(by_params.items()):
+            label = " ".join(f"{k}={v}" for k, v in key)
+            print(f"[{label}] {format_summary(stats)}", file=out)
+    print(format_summary(totals, wall_time), file=out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,129 @@
-import pygame
-
-from entities.obstacle import Obstacle
-from entities.player import Player
-from systems.enemy_manager import spawn_enemies, trigger_attack_clusters
-
-from systems.map_boundary import resolve_map_collision
-from systems.collisions import resolve_player_obstacle_collision, resolve_player_enemy_collision
-from systems.railgun import Railgun
+import argparse
+from contextlib import nullcontext
 
+import pygame
 
-def main():
+from systems.pipeline import FrameState
+from systems.profiler import FrameProfiler, count_steering_calls
+from systems.railgun import PiercingRailgun, Railgun
+from systems.renderer import WorldRenderer
+from systems.replay import ReplayWriter
+from systems.simulation import HEIGHT, WIDTH, PlayerInput, Simulation
+from systems.spawner import SpawnShortfall
+from systems.timestep import MAX_CATCH_UP_STEPS, TICK_RATE, FixedTimestep
+
+FPS = 60
+WEAPONS = {
+    "railgun": Railgun,
+    "pierce": PiercingRailgun,
+    "ricochet": lambda: PiercingRailgun(bounces=3),
+}
+
+
+def read_input():
+    keys = pygame.key.get_pressed()
+    move_x = keys[pygame.K_d] - keys[pygame.K_a]
+    move_y = keys[pygame.K_s] - keys[pygame.K_w]
+    return PlayerInput(
+        move=(move_x, move_y),
+        aim=pygame.mouse.get_pos(),
+        fire=bool(keys[pygame.K_SPACE]),
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="MobSurvival")
+    parser.add_argument("--profile", action="store_true", help="time each system; F3 toggles the overlay")
+    parser.add_argument("--count-calls", action="store_true", help="also count steering calls per frame")
+    parser.add_argument("--profile-out", metavar="PATH", help="write profiler stats on exit (.json or .csv)")
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE, help="simulation ticks per second")
+    parser.add_argument("--max-steps", type=int, default=MAX_CATCH_UP_STEPS, help="most ticks run to catch up in one frame")
+    parser.add_argument("--enemies", type=int, default=14)
+    parser.add_argument("--endless", action="store_true", help="waves keep streaming in until the player dies")
+    parser.add_argument("--weapon", choices=sorted(WEAPONS), default="railgun")
+    parser.add_argument("--dirty-rects", action="store_true", help="only push changed screen areas each frame")
+    parser.add_argument("--fps", type=int, default=FPS, help="render frame cap (0 = uncapped)")
+    parser.add_argument("--record", metavar="PATH", help="stream a replay of the match to PATH")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     pygame.init()
 
-    WIDTH, HEIGHT = 1200, 800
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     clock = pygame.time.Clock()
 
-    obstacles = [
-        Obstacle(300, 300, 60),
-        Obstacle(800, 500, 80),
-        Obstacle(600, 200, 40),
-        Obstacle(950, 200, 25),
-    ]
-
-    player = Player(WIDTH // 2, HEIGHT // 2)
-    enemies = spawn_enemies(14, WIDTH, HEIGHT, obstacles)
-    railgun = Railgun()
-
-    running = True
-    space_was_down = False
-    while running:
-        dt = clock.tick(60) / 1000.0
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-        keys = pygame.key.get_pressed()
-        mouse_pos = pygame.mouse.get_pos()
-
-        player.update(dt, keys, mouse_pos)
-        railgun.update(dt)
-        for enemy in enemies:
-            enemy.update(dt, WIDTH, HEIGHT, obstacles, enemies, player)
-        if len(enemies) <= 4:
-            for e in enemies:
-                e.state = "attack"
-                e.cluster_id = -1
-        else:
-            trigger_attack_clusters(enemies)
-        space_down = keys[pygame.K_SPACE]
-
-        resolve_map_collision(player, WIDTH, HEIGHT)
-        for enemy in enemies:
-            if resolve_player_enemy_collision(player, enemy):
+    try:
+        sim = Simulation(WIDTH, HEIGHT, enemy_count=args.enemies, endless=args.endless, railgun=WEAPONS[args.weapon]())
+    except SpawnShortfall as exc:
+        pygame.quit()
+        raise SystemExit(f"--enemies {args.enemies}: {exc}")
+    renderer = WorldRenderer(WIDTH, HEIGHT, sim.obstacles, dirty_rects=args.dirty_rects)
+    timestep = FixedTimestep(args.tick_rate, args.max_steps)
+    recorder = ReplayWriter(args.record, sim) if args.record else None
+
+    profiler = None
+    show_overlay = False
+    if args.profile or args.count_calls or args.profile_out:
+        profiler = FrameProfiler()
+        sim.profiler = profiler
+        show_overlay = args.profile
+        font = pygame.font.SysFont("monospace", 14)
+
+    # Each frame steps the world, then captures what the renderer reads
+    # into a FrameState and draws that, so drawing never touches the
+    # live simulation.
+    frame = FrameState()
+
+    # The steering helpers are only patched while the game runs.
+    counting = count_steering_calls(sim.profiler) if args.count_calls else nullcontext()
+    with counting:
+        running = True
+        while running:
+            frame_dt = clock.tick(args.fps) / 1000.0
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and profiler:
+                    show_overlay = not show_overlay
+                    renderer.invalidate()
+
+            control = read_input()
+            outcome = None
+            for _ in range(timestep.advance(frame_dt)):
+                outcome = sim.step(timestep.dt, control)
+                if recorder:
+                    recorder.record(sim, control, timestep.dt)
+                if outcome is not None:
+                    break
+            if outcome == "loss":
                 print("GAME OVER")
                 running = False
+            elif outcome == "win":
+                print("YOU WIN")
+                running = False
 
-        for ob in obstacles:
-            resolve_player_obstacle_collision(player, ob)
-        
-        if space_down and not space_was_down and player.can_shoot():
-            killed = railgun.fire(player, enemies, obstacles)
-            for e in killed:
-                enemies.remove(e)
-            player.trigger_shot_cooldown(0.7)
-
-        space_was_down = space_down
-
-        if len(enemies) == 0:
-            print("YOU WIN")
-            running = False
-
-        screen.fill((25, 25, 30))
-
-        for ob in obstacles:
-            ob.draw(screen)
-
-        player.draw(screen)
-        railgun.draw(screen)
-
-        for enemy in enemies:
-            enemy.draw(screen)
-
-        pygame.display.flip()
+            world = frame.capture(sim, timestep.alpha)
+            with sim.profiler.scope("draw"):
+                dirty = renderer.draw(screen, world, world.alpha)
+
+            if show_overlay:
+                profiler.draw_overlay(screen, font)
+                # The overlay isn't tracked as a dirty area; repaint it all next frame.
+                renderer.invalidate()
+            sim.profiler.end_frame()
+
+            if dirty is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(dirty)
+
+    if recorder:
+        recorder.close()
+    if profiler and args.profile_out:
+        profiler.export(args.profile_out)
 
     pygame.quit()
 
@@ -0,0 +1,45 @@
+import numpy as np
+
+from systems.enemy_swarm import ATTACK
+
+# (distance to the player, re-steer every N ticks); the last tier catches
+# everyone further out.
+LOD_TIERS = ((450.0, 1), (900.0, 2), (1800.0, 4), (np.inf, 8))
+# Below this many enemies a full re-steer costs less than picking who's due.
+LOD_MIN_ENEMIES = 64
+
+
+class AIScheduler:
+    # Level-of-detail for swarm steering. Enemies close to the player, and
+    # every attacker, re-steer each tick; further out they re-steer every
+    # 2, 4, 8... ticks and keep their last desired velocity in between, while
+    # integration and collisions still run for everyone every tick. Within a
+    # tier, enemies are spread over the period round-robin by slot so the
+    # cost per tick stays flat instead of spiking every N ticks. Swarms
+    # smaller than min_enemies aren't scheduled at all.
+    def __init__(self, tiers=LOD_TIERS, min_enemies=LOD_MIN_ENEMIES):
+        self.distances = np.array([d for d, _ in tiers], dtype=float)
+        self.periods = np.array([p for _, p in tiers], dtype=np.int64)
+        self.min_enemies = min_enemies
+        self.tick = 0
+
+    def periods_for(self, swarm, player_pos):
+        n = swarm.count
+        pos = swarm.position[:n]
+        dist = np.hypot(pos[:, 0] - player_pos.x, pos[:, 1] - player_pos.y)
+        tier = np.minimum(np.searchsorted(self.distances, dist), len(self.periods) - 1)
+        period = self.periods[tier]
+        period[swarm.state[:n] == ATTACK] = 1
+        return period
+
+    def due(self, swarm, player_pos):
+        # (slots to re-steer this tick, their periods). An enemy also becomes
+        # due once it has waited a full period, which covers new enemies and
+        # the one moved into a slot freed by a kill.
+        n = swarm.count
+        period = self.periods_for(swarm, player_pos)
+        age = swarm.steer_age[:n]
+        turn = (self.tick + np.arange(n)) % period == 0
+        self.tick += 1
+        rows = np.flatnonzero(turn | (age >= period))
+        return rows, period[rows]
@@ -0,0 +1,120 @@
+from math import inf, sqrt
+
+import numpy as np
+
+from systems.raycast import CircleGrid
+
+SWEEP_CELL_SIZE = 64
+# Up to this many mover x obstacle pairs, testing them all beats the grid.
+DENSE_SWEEP_MAX = 1024
+
+
+def time_of_impact(px, py, dx, dy, r, cx, cy, cr):
+    # Fraction of the move (px, py) -> (px + dx, py + dy) at which a circle
+    # of radius r first touches the circle (cx, cy, cr), or inf if it
+    # doesn't within the move. Starting overlaps are left to the
+    # penetration pass, so they never count as an impact.
+    fx = px - cx
+    fy = py - cy
+    reach = r + cr
+    c = fx * fx + fy * fy - reach * reach
+    if c < 0:
+        return inf
+    a = dx * dx + dy * dy
+    b = fx * dx + fy * dy
+    if a == 0 or b >= 0:
+        return inf
+    disc = b * b - a * c
+    if disc < 0:
+        return inf
+    t = (-b - sqrt(disc)) / a
+    return t if t <= 1.0 else inf
+
+
+def sweep_against(start, move, radius, cx, cy, cr):
+    # Vectorized time_of_impact for pairs of movers and obstacle circles;
+    # the arguments broadcast, so (n, 1) movers against (m,) obstacles give
+    # an (n, m) table.
+    fx = start[..., 0] - cx
+    fy = start[..., 1] - cy
+    reach = radius + cr
+    c = fx * fx + fy * fy - reach * reach
+    a = np.broadcast_to(move[..., 0] ** 2 + move[..., 1] ** 2, c.shape)
+    b = fx * move[..., 0] + fy * move[..., 1]
+    disc = b * b - a * c
+    t = np.full(c.shape, inf)
+    ok = (c >= 0) & (a > 0) & (b < 0) & (disc >= 0)
+    t[ok] = (-b[ok] - np.sqrt(disc[ok])) / a[ok]
+    t[t > 1.0] = inf
+    return t
+
+
+class ObstacleSweeper:
+    # Swept-circle collision against the static obstacles. Obstacles are
+    # bucketed with their radius grown by `reach`, the furthest a mover's
+    # edge can get from its start cell in one step, so candidate pairs are a
+    # single cell lookup per mover. The grid is rebuilt with a larger reach
+    # only when a step outgrows it. nearby() keeps a second grid the same
+    # way for wider queries.
+    def __init__(self, obstacles, cell_size=SWEEP_CELL_SIZE):
+        self.cx = np.array([ob.collider.position.x for ob in obstacles], dtype=float)
+        self.cy = np.array([ob.collider.position.y for ob in obstacles], dtype=float)
+        self.r = np.array([ob.collider.radius for ob in obstacles], dtype=float)
+        self.grid = CircleGrid(cell_size)
+        self.reach = -1.0
+        self.near_grid = CircleGrid(cell_size)
+        self.near_reach = -1.0
+
+    def _ensure_reach(self, reach):
+        if reach > self.reach:
+            self.reach = max(reach, self.reach * 2.0)
+            self.grid.build(self.cx, self.cy, self.r + self.reach)
+
+    def sweep(self, start, move, radius):
+        # Per mover: (time of impact in [0, 1] or inf, obstacle index or -1).
+        n = len(start)
+        toi = np.full(n, inf)
+        hit = np.full(n, -1)
+        if n == 0 or len(self.cx) == 0:
+            return toi, hit
+        step = np.hypot(move[:, 0], move[:, 1])
+        self._ensure_reach(float((step + radius).max()))
+
+        m = len(self.cx)
+        if n * m <= DENSE_SWEEP_MAX:
+            t = sweep_against(start[:, None], move[:, None], radius[:, None], self.cx, self.cy, self.r)
+            # argmin keeps the lowest obstacle index on ties, like the sort below.
+            k = np.argmin(t, axis=1)
+            toi = t[np.arange(n), k]
+            hit = np.where(np.isfinite(toi), k, -1)
+            return toi, hit
+
+        movers, obs = self.grid.point_items(start[:, 0], start[:, 1])
+        if len(movers) == 0:
+            return toi, hit
+        t = sweep_against(start[movers], move[movers], radius[movers], self.cx[obs], self.cy[obs], self.r[obs])
+        found = np.isfinite(t)
+        movers, obs, t = movers[found], obs[found], t[found]
+        # Earliest impact per mover: sort by time, keep each mover's first.
+        order = np.lexsort((t, movers))
+        movers, obs, t = movers[order], obs[order], t[order]
+        first = np.ones(len(movers), dtype=bool)
+        first[1:] = movers[1:] != movers[:-1]
+        toi[movers[first]] = t[first]
+        hit[movers[first]] = obs[first]
+        return toi, hit
+
+    def nearby(self, points, reach):
+        # (point, obstacle) candidates for every obstacle whose surface may
+        # be within `reach` of a point, each point's in obstacle order.
+        if reach > self.near_reach:
+            self.near_reach = max(reach, self.near_reach * 2.0)
+            self.near_grid.build(self.cx, self.cy, self.r + self.near_reach)
+        return self.near_grid.point_items(points[:, 0], points[:, 1])
+
+    def contact_normals(self, position, hit):
+        # Unit vectors from each hit obstacle's centre to the mover.
+        diff = np.column_stack((position[:, 0] - self.cx[hit], position[:, 1] - self.cy[hit]))
+        length = np.hypot(diff[:, 0], diff[:, 1])
+        length[length == 0] = 1.0
+        return diff / length[:, None]
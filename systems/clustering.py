@@ -0,0 +1,171 @@
+import numpy as np
+
+from systems.enemy_manager import CLUSTER_RADIUS
+from systems.enemy_swarm import ATTACK, BOLD, HIDE, NO_CLUSTER
+
+# Cluster id of the final rush, when so few enemies are left that they all
+# attack at once.
+LAST_STAND = -1
+
+
+def connected_components(n, i, j):
+    # Union-find over an edge list done as array passes: hook every node to
+    # the smallest label among its neighbours, then compress paths by pointer
+    # jumping until nothing changes. Returns one root label per node.
+    labels = np.arange(n)
+    if len(i) == 0:
+        return labels
+    while True:
+        low = np.minimum(labels[i], labels[j])
+        hooked = labels.copy()
+        np.minimum.at(hooked, labels[i], low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+class ClusterTracker:
+    # Replacement for trigger_attack_clusters on a swarm, with DBSCAN-style
+    # groups. update() reclusters the whole swarm from scratch every tick,
+    # from that tick's neighbour pairs; only the group ids persist. A core
+    # is a free (non-attacking) enemy with at least min_cluster_size - 1
+    # free neighbours within cluster_radius, the same test the scalar
+    # path's star clusters pass. Groups are the connected components of the
+    # core-to-core neighbour graph; a free enemy next to a core joins its
+    # nearest core's group, and everyone else is in none. A sparse line of
+    # enemies has no cores, so it never chains into one group. Group ids
+    # carry over from the previous tick by majority vote, and the
+    # attack-slot budget is enforced in array passes. Once the swarm is
+    # down to last_stand enemies, every one of them attacks, outside any
+    # group.
+    def __init__(self, cluster_radius=CLUSTER_RADIUS + 30, min_cluster_size=4, max_attackers=8, last_stand=4):
+        self.cluster_radius = cluster_radius
+        self.min_cluster_size = min_cluster_size
+        self.max_attackers = max_attackers
+        self.last_stand = last_stand
+        self.next_id = 1
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.centroids = np.zeros((0, 2))
+
+    def cluster(self, cluster_id):
+        # (size, centroid) for a group id, or None if it no longer exists.
+        k = np.searchsorted(self.ids, cluster_id)
+        if k < len(self.ids) and self.ids[k] == cluster_id:
+            return int(self.sizes[k]), self.centroids[k]
+        return None
+
+    def _stable_ids(self, comp, previous):
+        # Each component inherits the previous id most of its members had,
+        # biggest overlaps first; components left without one get a new id.
+        n_comp = int(comp.max()) + 1
+        ids = np.zeros(n_comp, dtype=np.int64)
+        had = previous != NO_CLUSTER
+        if had.any():
+            keys, counts = np.unique(
+                np.column_stack((comp[had], previous[had])), axis=0, return_counts=True
+            )
+            claimed = set()
+            for k in np.lexsort((keys[:, 1], keys[:, 0], -counts)):
+                c, old = int(keys[k, 0]), int(keys[k, 1])
+                if ids[c] == NO_CLUSTER and old not in claimed:
+                    ids[c] = old
+                    claimed.add(old)
+        fresh = np.flatnonzero(ids == NO_CLUSTER)
+        ids[fresh] = np.arange(self.next_id, self.next_id + len(fresh))
+        self.next_id += len(fresh)
+        return ids
+
+    def _members(self, pos, free, i, j):
+        # Root label per enemy and the mask of enemies in some group.
+        n = len(pos)
+        both = free[i] & free[j]
+        i, j = i[both], j[both]
+        core = free & (np.bincount(i, minlength=n) >= self.min_cluster_size - 1)
+        linked = core[i] & core[j]
+        roots = connected_components(n, i[linked], j[linked])
+        member = core.copy()
+
+        # Border enemies take the group of their nearest core neighbour.
+        edge = ~core[i] & core[j]
+        bi, bj = i[edge], j[edge]
+        if len(bi):
+            d = (pos[bi, 0] - pos[bj, 0]) ** 2 + (pos[bi, 1] - pos[bj, 1]) ** 2
+            order = np.lexsort((bj, d, bi))
+            bi, bj = bi[order], bj[order]
+            first = np.ones(len(bi), dtype=bool)
+            first[1:] = bi[1:] != bi[:-1]
+            roots[bi[first]] = roots[bj[first]]
+            member[bi[first]] = True
+        return roots, member
+
+    def _clear(self):
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.centroids = np.zeros((0, 2))
+
+    def update(self, swarm, pairs=None):
+        # `pairs`: every neighbour pair within cluster_radius, when the
+        # caller already has them.
+        n = swarm.count
+        if n == 0:
+            self._clear()
+            return
+        if n <= self.last_stand:
+            swarm.state[:n] = ATTACK
+            swarm.cluster_id[:n] = LAST_STAND
+            swarm.group[:n] = NO_CLUSTER
+            self._clear()
+            return
+
+        pos = swarm.position[:n]
+        state = swarm.state[:n]
+        attacking = state == ATTACK
+        free = ~attacking
+        i, j = swarm.neighbor_pairs(self.cluster_radius) if pairs is None else pairs
+
+        roots, member = self._members(pos, free, i, j)
+        group = swarm.group[:n]
+        group_size = np.zeros(n, dtype=np.int64)
+        if member.any():
+            _, comp = np.unique(roots[member], return_inverse=True)
+            comp_ids = self._stable_ids(comp, group[member])
+            group[:] = NO_CLUSTER
+            group[member] = comp_ids[comp]
+
+            mpos = pos[member]
+            sizes = np.bincount(comp)
+            group_size[member] = sizes[comp]
+            order = np.argsort(comp_ids)
+            self.ids = comp_ids[order]
+            self.sizes = sizes[order]
+            self.centroids = np.column_stack(
+                (np.bincount(comp, weights=mpos[:, 0]), np.bincount(comp, weights=mpos[:, 1]))
+            )[order] / self.sizes[:, None]
+        else:
+            group[:] = NO_CLUSTER
+            self._clear()
+
+        remaining = self.max_attackers - int(attacking.sum())
+        if remaining > 0:
+            # Every member is free, so a group's size is its free count.
+            eligible = group_size >= self.min_cluster_size
+            if eligible.any():
+                # Oldest group first (lowest id), members in swarm order.
+                candidates = np.flatnonzero(eligible)
+                candidates = candidates[np.argsort(group[candidates], kind="stable")][:remaining]
+                state[candidates] = ATTACK
+                swarm.cluster_id[candidates] = group[candidates]
+
+        # Attackers that lost their pack fall back to roaming.
+        degree = np.bincount(i, minlength=n)
+        lonely = (state == ATTACK) & (degree < 2)
+        if lonely.any():
+            state[lonely] = np.where(swarm.is_bold[:n][lonely], BOLD, HIDE)
+            swarm.cluster_id[:n][lonely] = NO_CLUSTER
@@ -0,0 +1,89 @@
+import numpy as np
+
+from systems.map_boundary import resolve_map_collision
+
+COLLISION_ITERATIONS = 3
+# Extra broad-phase reach, so pairs pushed into contact by an earlier
+# relaxation pass are still in the candidate set.
+CONTACT_MARGIN = 4.0
+
+_EMPTY = np.zeros(0, dtype=np.intp)
+
+
+class Contacts:
+    # What touched during one collision stage, as slot / obstacle index
+    # arrays. Enemy contacts are the ones found by the first relaxation
+    # pass, i.e. the overlaps integration produced.
+    __slots__ = ("player_enemy", "player_obstacle", "enemy_enemy", "enemy_obstacle")
+
+    def __init__(
+        self, player_enemy=_EMPTY, player_obstacle=_EMPTY, enemy_enemy=(_EMPTY, _EMPTY), enemy_obstacle=(_EMPTY, _EMPTY)
+    ):
+        self.player_enemy = player_enemy
+        self.player_obstacle = player_obstacle
+        self.enemy_enemy = enemy_enemy
+        self.enemy_obstacle = enemy_obstacle
+
+    @property
+    def player_hit(self):
+        return len(self.player_enemy) > 0
+
+
+class CollisionStage:
+    # The one place overlaps get resolved, run once per tick after every
+    # entity has moved. Candidate pairs come from a broad phase (the
+    # swarm's neighbour grid, the obstacle sweeper's cell grid), then all
+    # pairs are relaxed together for a few Jacobi passes, so the result
+    # doesn't depend on the order enemies are stored in.
+    def __init__(self, sweeper, iterations=COLLISION_ITERATIONS, margin=CONTACT_MARGIN):
+        self.sweeper = sweeper
+        self.iterations = iterations
+        self.margin = margin
+
+    def _resolve_player_obstacles(self, player):
+        # Out of the deepest overlapping obstacle, once per pass; returns
+        # every obstacle the player touched.
+        s = self.sweeper
+        if not len(s.cx):
+            return _EMPTY
+        p = player.position
+        r = player.collider.radius
+        touched = np.zeros(len(s.cx), dtype=bool)
+        for _ in range(self.iterations):
+            dx = p.x - s.cx
+            dy = p.y - s.cy
+            dist = np.hypot(dx, dy)
+            depth = r + s.r - dist
+            hit = (dist > 0) & (depth > 0)
+            if not hit.any():
+                break
+            touched |= hit
+            k = int(np.argmax(np.where(hit, depth, -np.inf)))
+            scale = depth[k] / dist[k]
+            p.set(p.x + dx[k] * scale, p.y + dy[k] * scale)
+        return np.flatnonzero(touched)
+
+    def _player_enemy(self, swarm, player):
+        n = swarm.count
+        p = player.position
+        pos = swarm.position[:n]
+        reach = swarm.radius[:n] + player.collider.radius
+        d_sq = (pos[:, 0] - p.x) ** 2 + (pos[:, 1] - p.y) ** 2
+        return np.flatnonzero(d_sq < reach * reach)
+
+    def resolve(self, swarm, player, width, height):
+        contacts = Contacts()
+        if swarm.count:
+            pairs = swarm.contact_pairs(self.margin)
+            for k in range(self.iterations):
+                obstacle_contacts, enemy_contacts = swarm.resolve_overlaps(self.sweeper, width, height, pairs)
+                if k == 0:
+                    contacts.enemy_obstacle = obstacle_contacts
+                    contacts.enemy_enemy = enemy_contacts
+                if not len(obstacle_contacts[0]) and not len(enemy_contacts[0]):
+                    break
+
+        resolve_map_collision(player, width, height)
+        contacts.player_enemy = self._player_enemy(swarm, player)
+        contacts.player_obstacle = self._resolve_player_obstacles(player)
+        return contacts
@@ -1,23 +1,52 @@
+from math import isfinite, sqrt
+
+import numpy as np
+
+
 def resolve_player_obstacle_collision(player, obstacle):
     p = player.collider.position
     o = obstacle.collider.position
 
-    diff = p.sub(o)
-    dist = diff.length()
+    dx = p.x - o.x
+    dy = p.y - o.y
+    dist_sq = dx * dx + dy * dy
     min_dist = player.collider.radius + obstacle.collider.radius
 
-    if dist < min_dist:
-        push = diff.normalized().mul(min_dist - dist)
-        player.position = player.position.add(push)
-        player.collider.position = player.position
+    if dist_sq < min_dist * min_dist:
+        if dist_sq == 0:
+            return
+        dist = sqrt(dist_sq)
+        s = (min_dist - dist) / dist
+        player.position.x += dx * s
+        player.position.y += dy * s
 
-def resolve_player_enemy_collision(player, enemy):
-    p = player.collider.position
-    e = enemy.collider.position
 
-    diff = p.sub(e)
-    dist = diff.length()
-    min_dist = player.collider.radius + enemy.collider.radius
+def sweep_player_obstacles(player, start, sweeper):
+    # Replays the player's move from `start` against the obstacles: stops at
+    # the first contact and keeps only the part of the rest of the move that
+    # slides along the surface.
+    p = player.position
+    if p.x == start[0] and p.y == start[1]:
+        return False
+    move = np.array([[p.x - start[0], p.y - start[1]]])
+    toi, hit = sweeper.sweep(np.array([start], dtype=float), move, np.array([player.collider.radius], dtype=float))
+    t = toi[0]
+    if not isfinite(t):
+        return False
+    mx, my = move[0]
+    cx = start[0] + mx * t
+    cy = start[1] + my * t
+    nx, ny = sweeper.contact_normals(np.array([[cx, cy]]), hit)[0]
+    rx = mx * (1.0 - t)
+    ry = my * (1.0 - t)
+    into = rx * nx + ry * ny
+    if into < 0:
+        rx -= nx * into
+        ry -= ny * into
+    p.set(cx + rx, cy + ry)
+    return True
 
-    return dist < min_dist
 
+def resolve_player_enemy_collision(player, enemy):
+    min_dist = player.collider.radius + enemy.collider.radius
+    return player.collider.position.dist_sq(enemy.collider.position) < min_dist * min_dist
@@ -0,0 +1,77 @@
+import numpy as np
+
+FIELD_CELL_SIZE = 8
+FIELD_MAX_DISTANCE = 160
+
+
+class DistanceField:
+    # Signed distance to the nearest obstacle surface, sampled on a regular
+    # grid over the arena, plus its gradient (pointing away from obstacles).
+    # Obstacles are fixed for a match, so this is built once at map load.
+    # Distances are capped at `max_distance`: past that the field is flat
+    # and steers nothing.
+    def __init__(self, obstacles, width, height, cell_size=FIELD_CELL_SIZE, max_distance=FIELD_MAX_DISTANCE):
+        self.cell_size = cell_size
+        self.max_distance = max_distance
+        nx = int(np.ceil(width / cell_size)) + 1
+        ny = int(np.ceil(height / cell_size)) + 1
+        self.shape = (nx, ny)
+
+        dist = np.full((nx, ny), float(max_distance))
+        gx = np.arange(nx) * float(cell_size)
+        gy = np.arange(ny) * float(cell_size)
+        for ob in obstacles:
+            c = ob.collider.position
+            reach = ob.collider.radius + max_distance
+            i0 = max(0, int((c.x - reach) // cell_size))
+            i1 = min(nx, int((c.x + reach) // cell_size) + 2)
+            j0 = max(0, int((c.y - reach) // cell_size))
+            j1 = min(ny, int((c.y + reach) // cell_size) + 2)
+            if i0 >= i1 or j0 >= j1:
+                continue
+            d = np.hypot(gx[i0:i1, None] - c.x, gy[None, j0:j1] - c.y) - ob.collider.radius
+            np.minimum(dist[i0:i1, j0:j1], d, out=dist[i0:i1, j0:j1])
+
+        self.distance = dist
+        grad_x, grad_y = np.gradient(dist, cell_size)
+        self.grad_x = grad_x
+        self.grad_y = grad_y
+        # (distance, grad x, grad y) per grid node, flattened, so sample()
+        # reads all three with one gather per corner.
+        self._nodes = np.stack((dist, grad_x, grad_y), axis=-1).reshape(-1, 3)
+
+    def _weights(self, points):
+        s = self.cell_size
+        nx, ny = self.shape
+        fx = np.clip(points[:, 0] / s, 0.0, nx - 1.000001)
+        fy = np.clip(points[:, 1] / s, 0.0, ny - 1.000001)
+        i = fx.astype(np.intp)
+        j = fy.astype(np.intp)
+        tx = fx - i
+        ty = fy - j
+        w00 = (1 - tx) * (1 - ty)
+        w10 = tx * (1 - ty)
+        w01 = (1 - tx) * ty
+        w11 = tx * ty
+        k = i * ny + j
+
+        def lerp(nodes):
+            # `nodes` is a flattened grid, one row (or value) per node.
+            if nodes.ndim == 2:
+                return (
+                    w00[:, None] * nodes[k] + w10[:, None] * nodes[k + ny]
+                    + w01[:, None] * nodes[k + 1] + w11[:, None] * nodes[k + ny + 1]
+                )
+            return w00 * nodes[k] + w10 * nodes[k + ny] + w01 * nodes[k + 1] + w11 * nodes[k + ny + 1]
+
+        return lerp
+
+    def sample(self, points):
+        # Bilinear (distance, gradient) at a batch of points, clamped to the
+        # grid. One gather per corner for the whole batch.
+        out = self._weights(points)(self._nodes)
+        return out[:, 0], out[:, 1:]
+
+    def sample_distance(self, points):
+        # Same as sample(), without the gradient.
+        return self._weights(points)(self._nodes[:, 0])
@@ -1,52 +1,53 @@
-import random
-
+from core.rng import default_rng
 from entities.enemy import Enemy
+from systems.spatial_hash import SpatialHash
+from systems.spawner import SPAWN_ATTEMPTS, FreeSpace, SpawnShortfall, spawn_points
 
 CLUSTER_RADIUS = 200
 _cluster_counter = 0
 
 
-def spawn_enemies(num, width, height, obstacles, enemy_radius=12, max_attempts=30):
-    enemies = []
-    center_x, center_y = width // 2, height // 2
+def spawn_enemies(num, width, height, obstacles, enemy_radius=12, max_attempts=SPAWN_ATTEMPTS, rng=None, allow_shortfall=False):
+    # Poisson-disk spawn: enemies never overlap each other, an obstacle or
+    # the player's start, and an Enemy is only built for accepted points.
+    # If the arena can't hold `num`, raises SpawnShortfall carrying the
+    # enemies that did fit, unless `allow_shortfall` asks for them directly.
+    if rng is None:
+        rng = default_rng()
     safe_radius = 50
-
-    for _ in range(num):
-        for attempt in range(max_attempts):
-            radius = enemy_radius
-            x = random.randint(radius, width - radius)
-            y = random.randint(radius, height - radius)
-
-            new_enemy = Enemy(x, y, radius)
-
-            dist_from_center = ((x - center_x)**2 + (y - center_y)**2) ** 0.5
-            if dist_from_center < safe_radius:
-                continue
-
-            collision = False
-            for ob in obstacles:
-                diff = new_enemy.position.sub(ob.collider.position)
-                dist = diff.length()
-                min_dist = radius + ob.collider.radius
-                if dist < min_dist:
-                    collision = True
-                    break
-
-            if not collision:    
-                enemies.append(new_enemy)
-                break
-
+    space = FreeSpace(width, height, obstacles, enemy_radius, keep_out=((width // 2, height // 2, safe_radius),))
+    points = spawn_points(num, space, rng, 2 * enemy_radius, max_attempts)
+    enemies = [Enemy(float(x), float(y), enemy_radius, rng=rng) for x, y in points]
+    if len(enemies) < num and not allow_shortfall:
+        raise SpawnShortfall(num, enemies)
     return enemies
 
 
-
 def _next_cluster_id():
     global _cluster_counter
     _cluster_counter += 1
     return _cluster_counter
 
 
-def trigger_attack_clusters(enemies, min_cluster_size=4, cluster_radius=CLUSTER_RADIUS + 30, max_attackers=8):
+def trigger_attack_clusters(enemies, min_cluster_size=4, cluster_radius=CLUSTER_RADIUS + 30, max_attackers=8, grid=None):
+    if grid is None:
+        grid = SpatialHash(cluster_radius).rebuild(enemies)
+    order = {id(e): i for i, e in enumerate(enemies)}
+    radius_sq = cluster_radius * cluster_radius
+
+    def neighbors(e):
+        p = e.position
+        px, py = p.x, p.y
+        found = []
+        for other in grid.query(px, py, cluster_radius):
+            if other is e:
+                continue
+            q = other.position
+            dx, dy = px - q.x, py - q.y
+            if dx * dx + dy * dy <= radius_sq:
+                found.append(other)
+        return found
+
     visited = set()
     current_attackers = sum(1 for e in enemies if e.state == "attack")
 
@@ -55,13 +56,12 @@ def trigger_attack_clusters(enemies, min_cluster_size=4, cluster_radius=CLUSTER_
             continue
 
         cluster = [e]
-        for other in enemies:
-            if other is e or other.state == "attack":
-                continue
-            if other in visited:
-                continue
-            if e.position.sub(other.position).length() <= cluster_radius:
-                cluster.append(other)
+        close = [
+            other for other in neighbors(e)
+            if other.state != "attack" and other not in visited
+        ]
+        close.sort(key=lambda other: order[id(other)])
+        cluster.extend(close)
 
         if len(cluster) >= min_cluster_size:
             remaining_slots = max_attackers - current_attackers
@@ -83,14 +83,8 @@ def trigger_attack_clusters(enemies, min_cluster_size=4, cluster_radius=CLUSTER_
             visited.update(cluster)
 
     for e in enemies:
-        close_count = 0
-        for other in enemies:
-            if other is not e:
-                if e.position.sub(other.position).length() <= cluster_radius:
-                    close_count += 1
-
-        if close_count < 2 and e.state == "attack":
+        if e.state != "attack":
+            continue
+        if len(neighbors(e)) < 2:
             e.state = "bold" if e.is_bold else "hide"
             e.cluster_id = None
-
-
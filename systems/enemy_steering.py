@@ -1,36 +1,40 @@
 import math
-import random
 
 from core.vector2 import Vector2
 
 
 def heading(enemy):
-    if enemy.velocity.length() == 0:
+    if enemy.velocity.length_sq() == 0:
         return Vector2(1, 0)
-    return enemy.velocity.normalized()
+    return enemy.velocity.copy().normalize_ip()
 
 
 def wander(enemy, dt):
     enemy.wander_angle += random_jitter(enemy) * dt
-    return Vector2(math.cos(enemy.wander_angle), math.sin(enemy.wander_angle)).mul(enemy.wander_speed)
+    s = enemy.wander_speed
+    return Vector2(math.cos(enemy.wander_angle) * s, math.sin(enemy.wander_angle) * s)
 
 
 def seek(enemy, target, speed):
     desired = target.sub(enemy.position)
-    l = desired.length()
-    if l == 0:
-        return Vector2()
-    return desired.normalized().mul(speed)
+    if desired.length_sq() == 0:
+        return desired
+    return desired.normalize_ip().imul(speed)
 
 
 def segment_hits_circle(a, b, center, radius):
-    ab = b.sub(a)
-    ab_len_sq = ab.x * ab.x + ab.y * ab.y
+    abx = b.x - a.x
+    aby = b.y - a.y
+    acx = center.x - a.x
+    acy = center.y - a.y
+    r_sq = radius * radius
+    ab_len_sq = abx * abx + aby * aby
     if ab_len_sq == 0:
-        return center.sub(a).length() <= radius
-    t = max(0, min(1, (center.sub(a).x * ab.x + center.sub(a).y * ab.y) / ab_len_sq))
-    closest = Vector2(a.x + ab.x * t, a.y + ab.y * t)
-    return center.sub(closest).length() <= radius
+        return acx * acx + acy * acy <= r_sq
+    t = max(0, min(1, (acx * abx + acy * aby) / ab_len_sq))
+    dx = acx - abx * t
+    dy = acy - aby * t
+    return dx * dx + dy * dy <= r_sq
 
 
 def line_blocked_by_obstacles(enemy, player_pos, obstacles):
@@ -40,162 +44,202 @@ def line_blocked_by_obstacles(enemy, player_pos, obstacles):
     return False
 
 
-def visible_to_player(enemy, player, obstacles):
+def visible_to_player(enemy, player, obstacles, shadows=None):
+    if shadows is not None:
+        return shadows.visible(enemy.position)
     return not line_blocked_by_obstacles(enemy, player.position, obstacles)
 
 
-def flee_from_player(enemy, player, max_distance=400):   
+def flee_from_player(enemy, player, max_distance=400):
     away = enemy.position.sub(player.position)
-    dist = away.length()
-    
-    if dist >= max_distance:
+    dist_sq = away.length_sq()
+
+    if dist_sq >= max_distance * max_distance:
         return Vector2()
 
-    return away.normalized().mul(enemy.attack_speed)
+    return away.normalize_ip().imul(enemy.attack_speed)
 
 
 
-def hide_from_player(enemy, player, obstacles):
-    best_spot = None
-    best_dist = None
+def hide_from_player(enemy, player, obstacles, hide_spots=None):
     player_pos = player.position
+    pos = enemy.position
+    base_offset = enemy.collider.radius + enemy.hide_distance
+
+    if hide_spots is not None:
+        spot = hide_spots.nearest(pos.x, pos.y, base_offset)
+        if spot is not None:
+            return seek(enemy, Vector2(spot[0], spot[1]), enemy.max_speed)
+        return pos.sub(player_pos).normalize_ip().imul(enemy.max_speed)
+
+    best_x = best_y = 0.0
+    best_dist_sq = None
 
     for ob in obstacles:
-        to_ob = ob.collider.position.sub(player_pos)
-        if to_ob.length() == 0:
+        c = ob.collider.position
+        dx = c.x - player_pos.x
+        dy = c.y - player_pos.y
+        l = math.hypot(dx, dy)
+        if l == 0:
             continue
-        spot_dir = to_ob.normalized()
-        hide_offset = ob.collider.radius + enemy.collider.radius + enemy.hide_distance
-        spot = ob.collider.position.add(spot_dir.mul(hide_offset))
-        dist = spot.sub(enemy.position).length()
+        s = (ob.collider.radius + base_offset) / l
+        sx = c.x + dx * s
+        sy = c.y + dy * s
+        ex = sx - pos.x
+        ey = sy - pos.y
+        dist_sq = ex * ex + ey * ey
 
-        if best_spot is None or dist < best_dist:
-            best_spot = spot
-            best_dist = dist
+        if best_dist_sq is None or dist_sq < best_dist_sq:
+            best_x, best_y = sx, sy
+            best_dist_sq = dist_sq
 
-    if best_spot:
-        return seek(enemy, best_spot, enemy.max_speed)
+    if best_dist_sq is not None:
+        return seek(enemy, Vector2(best_x, best_y), enemy.max_speed)
 
-    away = enemy.position.sub(player_pos)
-    if away.length() == 0:
-        return Vector2()
-    return away.normalized().mul(enemy.max_speed)
+    away = pos.sub(player_pos)
+    return away.normalize_ip().imul(enemy.max_speed)
 
 
 def avoid_obstacles(enemy, obstacles, width, height):
     steer = Vector2()
     r = enemy.collider.radius
+    pos = enemy.position
 
     head = heading(enemy)
+    hx, hy = head.x, head.y
     look_ahead = r + max(enemy.max_speed, enemy.attack_speed) * 0.4
 
     for ob in obstacles:
-        to_ob = ob.collider.position.sub(enemy.position)
-        proj = to_ob.x * head.x + to_ob.y * head.y
+        c = ob.collider.position
+        tx = c.x - pos.x
+        ty = c.y - pos.y
+        proj = tx * hx + ty * hy
         if proj < 0 or proj > look_ahead:
             continue
 
-        perp = abs(to_ob.x * (-head.y) + to_ob.y * head.x)
+        perp = abs(tx * (-hy) + ty * hx)
         min_clear = r + ob.collider.radius + 10
+        dist_sq = tx * tx + ty * ty
+        if dist_sq == 0:
+            continue
+        inv = 1.0 / math.sqrt(dist_sq)
         if perp < min_clear:
-            away = enemy.position.sub(ob.collider.position).normalized().mul((min_clear - perp))
-            steer = steer.add(away)
+            s = (min_clear - perp) * inv
+            steer.x -= tx * s
+            steer.y -= ty * s
 
-        dist = to_ob.length()
-        if 0 < dist < min_clear:
-            push = to_ob.normalized().mul(min_clear - dist)
-            steer = steer.add(push)
+        if dist_sq < min_clear * min_clear:
+            s = (min_clear * inv - 1.0)
+            steer.x += tx * s
+            steer.y += ty * s
 
     wall_margin = r + 25
-    if enemy.position.x < wall_margin:
-        steer.x += (wall_margin - enemy.position.x)
-    elif enemy.position.x > width - wall_margin:
-        steer.x -= (enemy.position.x - (width - wall_margin))
+    if pos.x < wall_margin:
+        steer.x += (wall_margin - pos.x)
+    elif pos.x > width - wall_margin:
+        steer.x -= (pos.x - (width - wall_margin))
+
+    if pos.y < wall_margin:
+        steer.y += (wall_margin - pos.y)
+    elif pos.y > height - wall_margin:
+        steer.y -= (pos.y - (height - wall_margin))
+
+    return steer.imul(enemy.avoid_weight)
 
-    if enemy.position.y < wall_margin:
-        steer.y += (wall_margin - enemy.position.y)
-    elif enemy.position.y > height - wall_margin:
-        steer.y -= (enemy.position.y - (height - wall_margin))
 
-    return steer.mul(enemy.avoid_weight)
+def _neighbors(enemy, enemies, grid, radius):
+    if grid is None:
+        return enemies
+    return grid.query(enemy.position.x, enemy.position.y, radius)
 
 
-def separate(enemy, enemies):
+def separate(enemy, enemies, grid=None):
     steer = Vector2()
-    for other in enemies:
+    pos = enemy.position
+    r = enemy.collider.radius
+    reach = r + 12 + (grid.max_radius if grid is not None else 0.0)
+    for other in _neighbors(enemy, enemies, grid, reach):
         if other is enemy:
             continue
-        diff = enemy.position.sub(other.position)
-        dist = diff.length()
-        min_dist = enemy.collider.radius + other.collider.radius + 12
-        if 0 < dist < min_dist:
-            steer = steer.add(diff.normalized().mul((min_dist - dist)))
-    return steer.mul(enemy.separation_weight)
-
-
-def cohesion(enemy, enemies, radius=200):
+        q = other.position
+        dx = pos.x - q.x
+        dy = pos.y - q.y
+        dist_sq = dx * dx + dy * dy
+        min_dist = r + other.collider.radius + 12
+        if 0 < dist_sq < min_dist * min_dist:
+            dist = math.sqrt(dist_sq)
+            s = (min_dist - dist) / dist
+            steer.x += dx * s
+            steer.y += dy * s
+    return steer.imul(enemy.separation_weight)
+
+
+def cohesion(enemy, enemies, radius=200, grid=None):
     center = Vector2()
     count = 0
-    for other in enemies:
+    pos = enemy.position
+    radius_sq = radius * radius
+    for other in _neighbors(enemy, enemies, grid, radius):
         if other is enemy:
             continue
-        dist = enemy.position.sub(other.position).length()
-        if dist <= radius:
-            center = center.add(other.position)
+        q = other.position
+        if pos.dist_sq(q) <= radius_sq:
+            center.iadd(q)
             count += 1
     if count == 0:
         return Vector2()
-    center = center.mul(1.0 / count)
+    center.imul(1.0 / count)
     return seek(enemy, center, enemy.max_speed)
 
 
 def center_bias(enemy, width, height, strength):
     to_center = Vector2(width * 0.5 - enemy.position.x, height * 0.5 - enemy.position.y)
-    if to_center.length() == 0:
-        return Vector2()
-    return to_center.normalized().mul(strength)
+    return to_center.normalize_ip().imul(strength)
 
 
-def roam_core(enemy, dt, enemies, obstacles, width, height):
+def roam_core(enemy, dt, enemies, obstacles, width, height, grid=None):
     wander_force = wander(enemy, dt)
     avoid_force = avoid_obstacles(enemy, obstacles, width, height)
-    coh = cohesion(enemy, enemies, radius=180).mul(0.2)
-    sep = separate(enemy, enemies)
     avoid_multiplier = 1.2 + (0.3 if enemy.is_bold else 0.0)
-    desired = Vector2()
-    desired = desired.add(avoid_force.mul(avoid_multiplier))
-    desired = desired.add(coh)
-    desired = desired.add(sep)
-    wander_scale = 0.5 if avoid_force.length() > 5 else 1.0
-    desired = desired.add(wander_force.mul(wander_scale))
-    desired = desired.add(center_bias(enemy, width, height, enemy.max_speed * 0.25))
+    wander_scale = 0.5 if avoid_force.length_sq() > 25 else 1.0
+
+    desired = avoid_force.imul(avoid_multiplier)
+    desired.iadd_scaled(cohesion(enemy, enemies, radius=180, grid=grid), 0.2)
+    desired.iadd(separate(enemy, enemies, grid))
+    desired.iadd_scaled(wander_force, wander_scale)
+    desired.iadd(center_bias(enemy, width, height, enemy.max_speed * 0.25))
     return desired, wander_force
 
 
 def random_jitter(enemy):
-    return random.uniform(-enemy.wander_jitter, enemy.wander_jitter)
-
-
-def steer_attack(enemy, player, enemies, obstacles, width, height):
-    desired = Vector2()
-    desired = desired.add(seek(enemy, player.position, enemy.attack_speed))
-    desired = desired.add(separate(enemy, enemies))
-    desired = desired.add(avoid_obstacles(enemy, obstacles, width, height))
+    return enemy.rng.uniform(-enemy.wander_jitter, enemy.wander_jitter)
+
+
+def steer_attack(enemy, player, enemies, obstacles, width, height, grid=None, shadows=None, nav=None):
+    desired = None
+    if nav is not None and not visible_to_player(enemy, player, obstacles, shadows):
+        fx, fy = nav.direction(enemy.position.x, enemy.position.y)
+        if fx or fy:
+            desired = Vector2(fx * enemy.attack_speed, fy * enemy.attack_speed)
+    if desired is None:
+        desired = seek(enemy, player.position, enemy.attack_speed)
+    desired.iadd(separate(enemy, enemies, grid))
+    desired.iadd(avoid_obstacles(enemy, obstacles, width, height))
     return desired, enemy.attack_speed
 
 
-def steer_hide(enemy, dt, player, enemies, obstacles, width, height):
-    desired, wander_force = roam_core(enemy, dt, enemies, obstacles, width, height)
-    visible = visible_to_player(enemy, player, obstacles)
+def steer_hide(enemy, dt, player, enemies, obstacles, width, height, grid=None, shadows=None, hide_spots=None):
+    desired, wander_force = roam_core(enemy, dt, enemies, obstacles, width, height, grid)
+    visible = visible_to_player(enemy, player, obstacles, shadows)
 
     if visible and not enemy.is_bold:
-        desired = desired.add(flee_from_player(enemy, player).mul(enemy.los_flee_weight))
-        desired = desired.add(hide_from_player(enemy, player, obstacles).mul(enemy.hide_weight))
-        desired = desired.add(wander_force.mul(0.6))
+        desired.iadd_scaled(flee_from_player(enemy, player), enemy.los_flee_weight)
+        desired.iadd_scaled(hide_from_player(enemy, player, obstacles, hide_spots), enemy.hide_weight)
+        desired.iadd_scaled(wander_force, 0.6)
         max_speed = enemy.attack_speed
     else:
         if enemy.is_bold:
-            desired = desired.add(heading(enemy).mul(enemy.max_speed * 0.5))
+            desired.iadd_scaled(heading(enemy), enemy.max_speed * 0.5)
             max_speed = enemy.attack_speed
         else:
             max_speed = enemy.max_speed
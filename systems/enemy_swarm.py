@@ -0,0 +1,782 @@
+import numpy as np
+
+from core.collider import CircleCollider
+from core.rng import default_rng
+from core.vector2 import Vector2
+from entities.enemy import Enemy
+from systems.ccd import DENSE_SWEEP_MAX, ObstacleSweeper
+from systems.hide_spots import HideSpotTable
+from systems.spatial_hash import grid_pairs
+from systems.visibility import ShadowMap
+
+HIDE = 0
+ATTACK = 1
+BOLD = 2
+STATE_NAMES = ("hide", "attack", "bold")
+STATE_CODES = {name: code for code, name in enumerate(STATE_NAMES)}
+
+NO_CLUSTER = 0
+
+COHESION_RADIUS = 180
+NEVER_STEERED = 1 << 30
+# Extra reach on the pairs built at the start of a tick, so they still hold
+# every pair in range after that tick's movement and collision pushes.
+PAIR_SKIN = 24.0
+
+_FLOAT_FIELDS = (
+    "radius",
+    "max_speed",
+    "attack_speed",
+    "wander_angle",
+    "wander_speed",
+    "wander_jitter",
+    "hide_distance",
+    "hide_weight",
+    "separation_weight",
+    "avoid_weight",
+    "los_flee_weight",
+    "bold_timer",
+    "bold_cooldown",
+)
+
+# Fields Enemy() derives from another one, as (field, scale, offset): a
+# set_param() on the source recomputes them unless they were set too.
+_DERIVED = {
+    "max_speed": (("attack_speed", 1.2, 0.0), ("wander_speed", 0.6, 0.0)),
+    "radius": (("hide_distance", 1.0, 12.0),),
+}
+
+
+class _RowVector(Vector2):
+    # Vector2 whose components live in one row of a swarm array.
+    __slots__ = ("_owner", "_field")
+
+    def __init__(self, owner, field):
+        self._owner = owner
+        self._field = field
+
+    @property
+    def x(self):
+        o = self._owner
+        return float(getattr(o.swarm, self._field)[o.index, 0])
+
+    @x.setter
+    def x(self, value):
+        o = self._owner
+        getattr(o.swarm, self._field)[o.index, 0] = value
+
+    @property
+    def y(self):
+        o = self._owner
+        return float(getattr(o.swarm, self._field)[o.index, 1])
+
+    @y.setter
+    def y(self, value):
+        o = self._owner
+        getattr(o.swarm, self._field)[o.index, 1] = value
+
+
+def _vector_field(field):
+    def fget(self):
+        return self._vectors[field]
+
+    def fset(self, value):
+        getattr(self.swarm, field)[self.index] = (value.x, value.y)
+
+    return property(fget, fset)
+
+
+def _float_field(field):
+    def fget(self):
+        return float(getattr(self.swarm, field)[self.index])
+
+    def fset(self, value):
+        getattr(self.swarm, field)[self.index] = value
+
+    return property(fget, fset)
+
+
+class SwarmEnemy(Enemy):
+    # Thin view over one slot of an EnemySwarm. Reads and writes go straight
+    # to the swarm arrays, so existing code that works on Enemy objects
+    # (railgun, collisions, clustering, drawing) keeps working unchanged.
+    def __init__(self, swarm, index):
+        self.swarm = swarm
+        self.index = index
+        self.rng = swarm.rng
+        self._vectors = {
+            "position": _RowVector(self, "position"),
+            "velocity": _RowVector(self, "velocity"),
+        }
+        self.collider = CircleCollider(0, 0, float(swarm.radius[index]))
+        self.collider.position = self._vectors["position"]
+
+    position = _vector_field("position")
+    velocity = _vector_field("velocity")
+
+    max_speed = _float_field("max_speed")
+    attack_speed = _float_field("attack_speed")
+    wander_angle = _float_field("wander_angle")
+    wander_speed = _float_field("wander_speed")
+    wander_jitter = _float_field("wander_jitter")
+    hide_distance = _float_field("hide_distance")
+    hide_weight = _float_field("hide_weight")
+    separation_weight = _float_field("separation_weight")
+    avoid_weight = _float_field("avoid_weight")
+    los_flee_weight = _float_field("los_flee_weight")
+    bold_timer = _float_field("bold_timer")
+    bold_cooldown = _float_field("bold_cooldown")
+
+    @property
+    def state(self):
+        return STATE_NAMES[self.swarm.state[self.index]]
+
+    @state.setter
+    def state(self, value):
+        self.swarm.state[self.index] = STATE_CODES[value]
+
+    @property
+    def is_bold(self):
+        return bool(self.swarm.is_bold[self.index])
+
+    @is_bold.setter
+    def is_bold(self, value):
+        self.swarm.is_bold[self.index] = value
+
+    @property
+    def cluster_id(self):
+        cid = int(self.swarm.cluster_id[self.index])
+        return None if cid == NO_CLUSTER else cid
+
+    @cluster_id.setter
+    def cluster_id(self, value):
+        self.swarm.cluster_id[self.index] = NO_CLUSTER if value is None else value
+
+    def update(self, dt, width, height, obstacles, enemies, player, grid=None, shadows=None, hide_spots=None):
+        raise TypeError("swarm enemies are stepped by EnemySwarm.update")
+
+
+class EnemySwarm:
+    def __init__(self, capacity=0, rng=None):
+        self.count = 0
+        self.rng = rng if rng is not None else default_rng()
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.prev_position = np.zeros((capacity, 2))
+        for field in _FLOAT_FIELDS:
+            setattr(self, field, np.zeros(capacity))
+        self.is_bold = np.zeros(capacity, dtype=bool)
+        self.state = np.zeros(capacity, dtype=np.int8)
+        self.cluster_id = np.zeros(capacity, dtype=np.int64)
+        self.group = np.zeros(capacity, dtype=np.int64)
+        # Last steering result per slot, reused by enemies the AI scheduler
+        # skips, and how many ticks ago it was computed.
+        self.steer_desired = np.zeros((capacity, 2))
+        self.steer_cap = np.zeros(capacity)
+        self.steer_age = np.zeros(capacity, dtype=np.int64)
+        self.enemies = []
+        # Views of removed enemies, handed out again by later adds, and the
+        # set_param() overrides that newly spawned enemies also get.
+        self._free_views = []
+        self.params = {}
+        # Every neighbour pair within _pair_reach of _pair_origin, built once
+        # at the start of update() and filtered by each consumer (steering,
+        # overlap resolution, clustering); None whenever a slot has changed
+        # since they were built.
+        self._pairs = None
+        self._pair_reach = 0.0
+        self._pair_origin = np.zeros((0, 2))
+
+    @classmethod
+    def from_enemies(cls, enemies, rng=None):
+        swarm = cls(len(enemies), rng=rng)
+        for enemy in enemies:
+            swarm.add(enemy)
+        return swarm
+
+    @classmethod
+    def from_arrays(cls, arrays, rng=None):
+        # Inverse of export_arrays(); every per-slot field must be present.
+        count = len(arrays["position"])
+        swarm = cls(count, rng=rng)
+        for field, arr in swarm._arrays():
+            arr[:count] = arrays[field]
+        swarm.count = count
+        swarm.enemies = [SwarmEnemy(swarm, i) for i in range(count)]
+        return swarm
+
+    def export_arrays(self):
+        return {field: arr[: self.count].copy() for field, arr in self._arrays()}
+
+    def __len__(self):
+        return self.count
+
+    def _arrays(self):
+        yield "position", self.position
+        yield "velocity", self.velocity
+        yield "prev_position", self.prev_position
+        for field in _FLOAT_FIELDS:
+            yield field, getattr(self, field)
+        yield "is_bold", self.is_bold
+        yield "state", self.state
+        yield "cluster_id", self.cluster_id
+        yield "group", self.group
+        yield "steer_desired", self.steer_desired
+        yield "steer_cap", self.steer_cap
+        yield "steer_age", self.steer_age
+
+    def _grow(self, needed=0):
+        # Doubling, so a long session settles at its peak size and stops
+        # reallocating; slots past `count` are the free list.
+        capacity = max(8, len(self.position) * 2)
+        while capacity < needed:
+            capacity *= 2
+        for field, arr in list(self._arrays()):
+            grown = np.zeros((capacity,) + arr.shape[1:], dtype=arr.dtype)
+            grown[: self.count] = arr[: self.count]
+            setattr(self, field, grown)
+
+    def _view(self, i):
+        if self._free_views:
+            view = self._free_views.pop()
+            view.index = i
+            view.collider.radius = float(self.radius[i])
+        else:
+            view = SwarmEnemy(self, i)
+        self.enemies.append(view)
+        return view
+
+    def add(self, enemy):
+        if self.count == len(self.position):
+            self._grow()
+        i = self.count
+        self.position[i] = (enemy.position.x, enemy.position.y)
+        self.velocity[i] = (enemy.velocity.x, enemy.velocity.y)
+        self.prev_position[i] = self.position[i]
+        self.radius[i] = enemy.collider.radius
+        for field in _FLOAT_FIELDS[1:]:
+            getattr(self, field)[i] = getattr(enemy, field)
+        self.is_bold[i] = enemy.is_bold
+        self.state[i] = STATE_CODES[enemy.state]
+        self.cluster_id[i] = NO_CLUSTER if enemy.cluster_id is None else enemy.cluster_id
+        self.group[i] = NO_CLUSTER
+        self.steer_desired[i] = 0.0
+        self.steer_cap[i] = 0.0
+        self.steer_age[i] = NEVER_STEERED
+        self.count += 1
+        self._pairs = None
+        return self._view(i)
+
+    def spawn(self, points, radius=12, min_speed=80, max_speed=130):
+        # Fresh enemies at `points`, written straight into free slots with
+        # the same random rolls Enemy() makes, but one array draw each.
+        k = len(points)
+        if self.count + k > len(self.position):
+            self._grow(self.count + k)
+        rows = slice(self.count, self.count + k)
+        rng = self.rng
+        speed = rng.uniform_array(min_speed, max_speed, k)
+        self.position[rows] = points
+        self.velocity[rows] = 0.0
+        self.prev_position[rows] = points
+        self.radius[rows] = radius
+        self.max_speed[rows] = speed
+        self.attack_speed[rows] = speed * 1.2
+        self.wander_angle[rows] = rng.uniform_array(0, 2 * 3.1415926, k)
+        self.wander_speed[rows] = speed * 0.6
+        self.wander_jitter[rows] = 2.5
+        self.hide_distance[rows] = radius + 12
+        self.hide_weight[rows] = 1.3
+        self.separation_weight[rows] = 1.4
+        self.avoid_weight[rows] = 1.6
+        self.los_flee_weight[rows] = 1.3
+        self.bold_timer[rows] = rng.uniform_array(10.0, 14.0, k)
+        self.bold_cooldown[rows] = rng.uniform_array(4.0, 6.0, k)
+        self._apply_params(rows)
+        self.is_bold[rows] = False
+        self.state[rows] = HIDE
+        self.cluster_id[rows] = NO_CLUSTER
+        self.group[rows] = NO_CLUSTER
+        self.steer_desired[rows] = 0.0
+        self.steer_cap[rows] = 0.0
+        self.steer_age[rows] = NEVER_STEERED
+        start = self.count
+        self.count += k
+        self._pairs = None
+        return [self._view(i) for i in range(start, self.count)]
+
+    def save_previous(self):
+        # Keeps this tick's positions for render interpolation; the copy lives
+        # in a per-slot array so remove() keeps it aligned.
+        self.prev_position[: self.count] = self.position[: self.count]
+
+    def _apply_params(self, rows):
+        for name, value in self.params.items():
+            getattr(self, name)[rows] = value
+            for field, scale, offset in _DERIVED.get(name, ()):
+                if field not in self.params:
+                    getattr(self, field)[rows] = value * scale + offset
+
+    def set_param(self, name, value):
+        if name not in _FLOAT_FIELDS:
+            raise ValueError(f"unknown enemy parameter: {name}")
+        self.params[name] = value
+        self._apply_params(slice(0, self.count))
+        if name == "radius":
+            for view in self.enemies:
+                view.collider.radius = float(value)
+
+    def remove(self, view):
+        # Swap-remove: the last enemy moves into the freed slot, so a kill
+        # costs O(1) whatever the swarm size. Only that one view changes
+        # index; the removed view goes on the free list for reuse.
+        i = view.index
+        last = self.count - 1
+        if i != last:
+            for field, arr in self._arrays():
+                arr[i] = arr[last]
+            moved = self.enemies[last]
+            moved.index = i
+            self.enemies[i] = moved
+        self.enemies.pop()
+        self.count = last
+        self._pairs = None
+        view.index = None
+        self._free_views.append(view)
+
+    # --- steering -----------------------------------------------------------
+
+    def _heading(self, vel):
+        speed = np.hypot(vel[:, 0], vel[:, 1])[:, None]
+        head = np.zeros_like(vel)
+        head[:, 0] = 1.0
+        return np.divide(vel, speed, out=head, where=speed > 0)
+
+    def _update_bold_state(self, dt):
+        n = self.count
+        bold = self.is_bold[:n]
+        timer = self.bold_timer[:n]
+        cooldown = self.bold_cooldown[:n]
+
+        timer[bold] -= dt
+        cooldown[~bold] -= dt
+
+        calm = bold & (timer <= 0)
+        wake = ~bold & (cooldown <= 0)
+        if calm.any():
+            bold[calm] = False
+            cooldown[calm] = self.rng.uniform_array(3.0, 6.0, calm.sum())
+        if wake.any():
+            bold[wake] = True
+            timer[wake] = self.rng.uniform_array(0.5, 1.0, wake.sum())
+
+    def _build_pairs(self, reach):
+        n = self.count
+        pos = self.position[:n]
+        self._pairs = grid_pairs(pos, reach)
+        self._pair_reach = reach
+        self._pair_origin = pos.copy()
+
+    def neighbor_pairs(self, reach):
+        # Every ordered pair (i, j) no further apart than `reach` right now.
+        # Filters this tick's pairs as long as nobody has moved far enough
+        # since they were built for a pair in range to be missing from them,
+        # else builds a fresh set.
+        n = self.count
+        pos = self.position[:n]
+        if self._pairs is not None:
+            moved = pos - self._pair_origin
+            drift = 2 * float(np.sqrt((moved[:, 0] ** 2 + moved[:, 1] ** 2).max())) if n else 0.0
+            if reach + drift <= self._pair_reach:
+                i, j = self._pairs
+                diff = pos[i] - pos[j]
+                near = diff[:, 0] ** 2 + diff[:, 1] ** 2 <= reach * reach
+                return i[near], j[near]
+        return grid_pairs(pos, reach)
+
+    def _neighbor_pairs(self, pos, radius, rows=None):
+        i, j = self.neighbor_pairs(max(COHESION_RADIUS, 2 * float(radius.max()) + 12))
+        if rows is None:
+            return i, j
+        due = np.zeros(len(pos), dtype=bool)
+        due[rows] = True
+        keep = due[i]
+        return i[keep], j[keep]
+
+    def _pair_sum(self, i, values, n):
+        out = np.zeros((n, 2))
+        out[:, 0] = np.bincount(i, weights=values[:, 0], minlength=n)
+        out[:, 1] = np.bincount(i, weights=values[:, 1], minlength=n)
+        return out
+
+    def _separate_and_cohesion(self, pos, radius, coh_mask, coh_radius=COHESION_RADIUS, rows=None):
+        # Sums for the enemies in `rows` (all when None) against every
+        # enemy; results and coh_mask are indexed like rows.
+        if rows is None:
+            n = len(pos)
+            i, j = self._neighbor_pairs(pos, radius)
+            local = i
+        else:
+            n = len(rows)
+            i, j = self._neighbor_pairs(pos, radius, rows)
+            slot = np.empty(len(pos), dtype=np.intp)
+            slot[rows] = np.arange(n)
+            local = slot[i]
+        diff = pos[i] - pos[j]
+        dist = np.hypot(diff[:, 0], diff[:, 1])
+
+        min_dist = radius[i] + radius[j] + 12
+        near = (dist > 0) & (dist < min_dist)
+        push = diff[near] * ((min_dist - dist)[near] / dist[near])[:, None]
+        sep = self._pair_sum(local[near], push, n)
+
+        close = (dist <= coh_radius) & coh_mask[local]
+        coh_sum = self._pair_sum(local[close], pos[j[close]], n)
+        coh_count = np.bincount(local[close], minlength=n).astype(float)
+        return sep, coh_sum, coh_count
+
+    def _seek(self, pos, target, speed):
+        desired = target - pos
+        dist = np.hypot(desired[:, 0], desired[:, 1])[:, None]
+        out = np.divide(desired, dist, out=np.zeros_like(desired), where=dist > 0)
+        out *= speed[:, None]
+        return out
+
+    def _avoid_pairs(self, pos, head, radius, look_ahead, sweeper, who, ob):
+        # The per-obstacle projection for (enemy, obstacle) pairs, summed per
+        # enemy in pair order.
+        to_x = sweeper.cx[ob] - pos[who, 0]
+        to_y = sweeper.cy[ob] - pos[who, 1]
+        hx = head[who, 0]
+        hy = head[who, 1]
+        proj = to_x * hx + to_y * hy
+        ahead = (proj >= 0) & (proj <= look_ahead[who])
+        perp = np.abs(to_x * -hy + to_y * hx)
+        min_clear = radius[who] + sweeper.r[ob] + 10
+        dist = np.hypot(to_x, to_y)
+        ahead &= dist > 0
+        scale = np.where(ahead & (dist < min_clear), min_clear - dist, 0.0)
+        scale -= np.where(ahead & (perp < min_clear), min_clear - perp, 0.0)
+        scale /= np.where(dist > 0, dist, 1.0)
+        n = len(pos)
+        return np.column_stack(
+            (np.bincount(who, to_x * scale, minlength=n), np.bincount(who, to_y * scale, minlength=n))
+        )
+
+    def _avoid_obstacles(self, pos, head, radius, width, height, sweeper, field=None, rows=None):
+        n = len(pos)
+        m = len(sweeper.cx)
+        if rows is None:
+            rows = slice(0, n)
+        look_ahead = radius + np.maximum(self.max_speed[rows], self.attack_speed[rows]) * 0.4
+        if n * m <= DENSE_SWEEP_MAX:
+            who = np.repeat(np.arange(n), m)
+            ob = np.tile(np.arange(m), n)
+        else:
+            # Only an obstacle whose surface is within look_ahead + radius + 10
+            # can push. The field rules out enemies clear of every obstacle:
+            # a bilinear sample is within a cell diagonal of the true distance.
+            reach = look_ahead + radius + 10
+            near = np.arange(n)
+            if field is not None:
+                near = np.flatnonzero(field.sample_distance(pos) < reach + 2 * field.cell_size)
+            who, ob = sweeper.nearby(pos[near], float(reach.max()))
+            who = near[who]
+        steer = self._avoid_pairs(pos, head, radius, look_ahead, sweeper, who, ob)
+
+        # Back towards the arena, `margin` in from each wall.
+        margin = (radius + 25)[:, None]
+        steer += np.minimum(np.maximum(pos, margin), np.array((width, height)) - margin) - pos
+        return steer * self.avoid_weight[rows, None]
+
+    def _center_bias(self, pos, width, height, strength):
+        return self._seek(pos, np.array((width * 0.5, height * 0.5)), strength)
+
+    def _hide_from_player(self, pos, radius, hide_distance, speed, player_pos, hide_spots):
+        best_spot, found = hide_spots.nearest_many(pos, radius + hide_distance)
+        out = np.zeros_like(pos)
+        out[found] = self._seek(pos[found], best_spot[found], speed[found])
+        lost = ~found
+        if lost.any():
+            origin = np.broadcast_to((player_pos.x, player_pos.y), (int(lost.sum()), 2))
+            out[lost] = self._seek(origin, pos[lost], speed[lost])
+        return out
+
+    def _flee_from_player(self, pos, player_pos, speed, max_distance=400):
+        p = np.array((player_pos.x, player_pos.y))
+        away = pos - p
+        dist = np.hypot(away[:, 0], away[:, 1])[:, None]
+        out = np.divide(away, dist, out=np.zeros_like(away), where=(dist > 0) & (dist < max_distance))
+        out *= speed[:, None]
+        return out
+
+    def _follow_flow(self, pos, chase, speed, visible, nav):
+        # Attackers without a clear line to the player take the shared flow
+        # field route around obstacles instead of seeking straight at them.
+        blocked = np.flatnonzero(~visible)
+        if len(blocked) == 0:
+            return chase
+        flow = nav.directions(pos[blocked])
+        routed = (flow[:, 0] != 0) | (flow[:, 1] != 0)
+        chase[blocked[routed]] = flow[routed] * speed[blocked[routed], None]
+        return chase
+
+    def _steer(self, dt, width, height, sweeper, player, shadows, hide_spots, field=None, nav=None, rows=None):
+        # Desired velocity and speed cap for the enemies in `rows` (all when
+        # None). dt may be per row: the time since each one last steered.
+        n = self.count
+        everyone = rows is None
+        if everyone:
+            rows = slice(0, n)
+        pos = self.position[rows]
+        vel = self.velocity[rows]
+        radius = self.radius[rows]
+        max_speed = self.max_speed[rows]
+        attack_speed = self.attack_speed[rows]
+
+        head = self._heading(vel)
+        attack = self.state[rows] == ATTACK
+        hide = ~attack
+        bold = self.is_bold[rows]
+        visible = shadows.visible_mask(pos)
+
+        if everyone:
+            sep, coh_sum, coh_count = self._separate_and_cohesion(pos, radius, hide)
+        else:
+            sep, coh_sum, coh_count = self._separate_and_cohesion(
+                self.position[:n], self.radius[:n], hide, rows=rows
+            )
+        sep *= self.separation_weight[rows, None]
+        avoid = self._avoid_obstacles(pos, head, radius, width, height, sweeper, field, rows)
+
+        m = len(pos)
+        desired = np.zeros((m, 2))
+        speed_cap = np.where(attack, attack_speed, max_speed)
+
+        if attack.any():
+            player_pos = np.array((player.position.x, player.position.y))
+            apos = pos[attack]
+            chase = self._seek(apos, player_pos, attack_speed[attack])
+            if nav is not None:
+                chase = self._follow_flow(apos, chase, attack_speed[attack], visible[attack], nav)
+            desired[attack] = chase + sep[attack] + avoid[attack]
+
+        if hide.any():
+            idx = np.flatnonzero(hide)
+            hpos = pos[idx]
+            hmax = max_speed[idx]
+            bold_h = bold[idx]
+            slots = idx if everyone else rows[idx]
+
+            jitter = self.wander_jitter[slots]
+            step = dt if np.ndim(dt) == 0 else dt[idx]
+            self.wander_angle[slots] += self.rng.uniform_array(-jitter, jitter) * step
+            angle = self.wander_angle[slots]
+            wander_force = np.column_stack((np.cos(angle), np.sin(angle))) * self.wander_speed[slots, None]
+
+            coh = np.zeros((len(idx), 2))
+            count = coh_count[idx]
+            has_group = count > 0
+            if has_group.any():
+                centers = coh_sum[idx][has_group] / count[has_group, None]
+                coh[has_group] = self._seek(hpos[has_group], centers, hmax[has_group]) * 0.2
+
+            avoid_h = avoid[idx]
+            avoid_multiplier = np.where(bold_h, 1.5, 1.2)
+            avoid_len = np.hypot(avoid_h[:, 0], avoid_h[:, 1])
+            wander_scale = np.where(avoid_len > 5, 0.5, 1.0)
+
+            roam = (
+                avoid_h * avoid_multiplier[:, None]
+                + coh
+                + sep[idx]
+                + wander_force * wander_scale[:, None]
+                + self._center_bias(hpos, width, height, hmax * 0.25)
+            )
+
+            fleeing = visible[idx] & ~bold_h
+            if fleeing.any():
+                fidx = idx[fleeing]
+                fslots = slots[fleeing]
+                fpos = pos[fidx]
+                roam[fleeing] += (
+                    self._flee_from_player(fpos, player.position, attack_speed[fidx])
+                    * self.los_flee_weight[fslots, None]
+                )
+                roam[fleeing] += (
+                    self._hide_from_player(
+                        fpos, radius[fidx], self.hide_distance[fslots], hmax[fleeing], player.position, hide_spots
+                    )
+                    * self.hide_weight[fslots, None]
+                )
+                roam[fleeing] += wander_force[fleeing] * 0.6
+            if bold_h.any():
+                roam[bold_h] += head[idx][bold_h] * (hmax[bold_h, None] * 0.5)
+
+            desired[idx] = roam
+            speed_cap[idx] = np.where(fleeing | bold_h, attack_speed[idx], hmax)
+
+        idle = (desired[:, 0] == 0) & (desired[:, 1] == 0)
+        desired[idle] = head[idle] * (max_speed[idle, None] * 0.25)
+        return desired, speed_cap
+
+    def _steer_scheduled(self, dt, width, height, sweeper, player, shadows, hide_spots, field, nav, scheduler):
+        n = self.count
+        age = self.steer_age[:n]
+        age += 1
+        rows, period = scheduler.due(self, player.position)
+        if len(rows):
+            # Wander drifts by the time since the last re-steer, not one tick.
+            elapsed = np.minimum(age[rows], period) * dt
+            desired, cap = self._steer(elapsed, width, height, sweeper, player, shadows, hide_spots, field, nav, rows)
+            self.steer_desired[rows] = desired
+            self.steer_cap[rows] = cap
+            age[rows] = 0
+        return self.steer_desired[:n].copy(), self.steer_cap[:n]
+
+    # --- integration --------------------------------------------------------
+
+    def _limit(self, vec, max_len):
+        length = np.hypot(vec[:, 0], vec[:, 1])
+        over = length > max_len
+        vec[over] *= (max_len[over] / length[over])[:, None]
+        return vec
+
+    def _sweep(self, dt, sweeper):
+        # Moves every enemy along vel * dt, stopping at the first obstacle
+        # contact and bouncing off it the same way a penetration fix does.
+        n = self.count
+        pos = self.position[:n]
+        vel = self.velocity[:n]
+        move = vel * dt
+        toi, hit = sweeper.sweep(pos, move, self.radius[:n])
+        struck = np.isfinite(toi)
+        pos += move * np.where(struck, toi, 1.0)[:, None]
+        if not struck.any():
+            return
+        away = sweeper.contact_normals(pos[struck], hit[struck])
+        target_speed = np.where(self.state[:n] == ATTACK, self.attack_speed[:n], self.max_speed[:n])[struck]
+        speed = np.maximum(np.hypot(vel[struck, 0], vel[struck, 1]), target_speed * 0.8)
+        vel[struck] = away * speed[:, None]
+
+    def _resolve_obstacle_penetration(self, sweeper):
+        # Pushes enemies out of every obstacle they overlap, using the
+        # sweeper's candidate pairs. Each enemy visits its candidates in
+        # obstacle order against its position so far, one round per rank,
+        # which is what a loop over all obstacles does.
+        # Returns the (slot, obstacle) contacts resolved.
+        n = self.count
+        pos = self.position[:n]
+        vel = self.velocity[:n]
+        radius = self.radius[:n]
+        if n * len(sweeper.cx) <= DENSE_SWEEP_MAX:
+            # Few pairs: one direct test settles the usual tick with no contact.
+            dist = np.hypot(pos[:, 0, None] - sweeper.cx, pos[:, 1, None] - sweeper.cy)
+            if not ((dist > 0) & (dist < radius[:, None] + sweeper.r)).any():
+                empty = np.zeros(0, dtype=np.intp)
+                return empty, empty
+        # point_items() lists each mover's candidates in obstacle order.
+        movers, obs = sweeper.grid.point_items(pos[:, 0], pos[:, 1])
+        start = np.ones(len(movers), dtype=bool)
+        start[1:] = movers[1:] != movers[:-1]
+        first = np.flatnonzero(start)
+        rank = np.arange(len(movers)) - np.repeat(first, np.diff(np.append(first, len(movers))))
+        hits = np.zeros(len(movers), dtype=bool)
+        for r in range(int(rank.max()) + 1 if len(rank) else 0):
+            k = np.flatnonzero(rank == r)
+            who, ob = movers[k], obs[k]
+            diff = np.column_stack((pos[who, 0] - sweeper.cx[ob], pos[who, 1] - sweeper.cy[ob]))
+            dist = np.hypot(diff[:, 0], diff[:, 1])
+            depth = radius[who] + sweeper.r[ob] - dist
+            hit = (dist > 0) & (depth > 0)
+            if not hit.any():
+                continue
+            hits[k[hit]] = True
+            who = who[hit]
+            away = diff[hit] / dist[hit, None]
+            pos[who] += away * depth[hit, None]
+            target_speed = np.where(self.state[who] == ATTACK, self.attack_speed[who], self.max_speed[who])
+            speed = np.maximum(np.hypot(vel[who, 0], vel[who, 1]), target_speed * 0.8)
+            vel[who] = away * speed[:, None]
+        return movers[hits], obs[hits]
+
+    def _resolve_enemy_penetration(self, pairs=None):
+        # Returns the overlapping pairs, each once (i < j).
+        n = self.count
+        pos = self.position[:n]
+        radius = self.radius[:n]
+        i, j = self.contact_pairs() if pairs is None else pairs
+        diff = pos[i] - pos[j]
+        dist = np.hypot(diff[:, 0], diff[:, 1])
+        min_dist = radius[i] + radius[j]
+        hit = (dist > 0) & (dist < min_dist)
+        push = diff[hit] * ((min_dist - dist)[hit] * 0.5 / dist[hit])[:, None]
+        pos += self._pair_sum(i[hit], push, n)
+        once = hit & (i < j)
+        return i[once], j[once]
+
+    def contact_pairs(self, margin=0.0):
+        # Broad phase for overlap resolution: every pair that could touch
+        # within `margin` of movement.
+        return self.neighbor_pairs(2 * float(self.radius[: self.count].max()) + margin)
+
+    def resolve_overlaps(self, sweeper, width, height, pairs=None):
+        # One relaxation pass: obstacles, then enemy pairs, then the arena
+        # edge. Returns the (slot, obstacle) and (slot, slot) contacts.
+        if self.count == 0:
+            empty = np.zeros(0, dtype=np.intp)
+            return (empty, empty), (empty, empty)
+        obstacle_contacts = self._resolve_obstacle_penetration(sweeper)
+        enemy_contacts = self._resolve_enemy_penetration(pairs)
+        self._clamp_to_bounds(width, height)
+        return obstacle_contacts, enemy_contacts
+
+    def _clamp_to_bounds(self, width, height):
+        n = self.count
+        pos = self.position[:n]
+        vel = self.velocity[:n]
+        radius = self.radius[:n, None]
+        limit = np.array((width, height), dtype=float)
+        bounce = (np.where(self.state[:n] == ATTACK, self.attack_speed[:n], self.max_speed[:n]) * 0.8)[:, None]
+        low = pos - radius < 0
+        high = ~low & (pos + radius > limit)
+        if low.any() or high.any():
+            pos[:] = np.where(low, radius, np.where(high, limit - radius, pos))
+            vel[:] = np.where(low, bounce, np.where(high, -bounce, vel))
+
+    def update(
+        self, dt, width, height, obstacles, player, shadows=None, hide_spots=None, sweeper=None, field=None, nav=None,
+        scheduler=None, resolve=True, pair_reach=0.0,
+    ):
+        # With resolve=False only steering and integration run; the caller
+        # owns overlap resolution (see systems.collision_stage). pair_reach
+        # is the largest neighbour radius the caller will ask for this tick.
+        self._pairs = None
+        n = self.count
+        if n == 0:
+            return
+        radius = self.radius[:n]
+        self._build_pairs(max(COHESION_RADIUS, 2 * float(radius.max()) + 12, pair_reach) + PAIR_SKIN)
+        if shadows is None:
+            shadows = ShadowMap(obstacles).rebuild(player.position)
+        if hide_spots is None:
+            hide_spots = HideSpotTable(obstacles).rebuild(player.position)
+        if sweeper is None:
+            sweeper = ObstacleSweeper(obstacles)
+        self._update_bold_state(dt)
+        if scheduler is None or n < scheduler.min_enemies:
+            desired, speed_cap = self._steer(dt, width, height, sweeper, player, shadows, hide_spots, field, nav)
+            self.steer_age[:n] = 0
+        else:
+            desired, speed_cap = self._steer_scheduled(
+                dt, width, height, sweeper, player, shadows, hide_spots, field, nav, scheduler
+            )
+
+        desired = self._limit(desired, speed_cap)
+        vel = self.velocity[:n]
+        vel *= 0.6
+        vel += desired * 0.4
+        self._limit(vel, speed_cap)
+        self._sweep(dt, sweeper)
+        if resolve:
+            self.resolve_overlaps(sweeper, width, height)
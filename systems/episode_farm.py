@@ -0,0 +1,147 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from math import hypot
+
+from core.rng import WorldRng
+from entities.obstacle import Obstacle
+from systems.simulation import HEIGHT, WIDTH, Simulation, autopilot
+
+
+class EpisodeSpec:
+    __slots__ = ("seed", "enemy_count", "layout", "enemy_params", "width", "height", "dt", "max_time")
+
+    def __init__(
+        self,
+        seed,
+        enemy_count=14,
+        layout=None,
+        enemy_params=None,
+        width=WIDTH,
+        height=HEIGHT,
+        dt=1.0 / 60.0,
+        max_time=120.0,
+    ):
+        self.seed = seed
+        self.enemy_count = enemy_count
+        self.layout = layout
+        self.enemy_params = enemy_params or {}
+        self.width = width
+        self.height = height
+        self.dt = dt
+        self.max_time = max_time
+
+
+def random_layout(seed, width=WIDTH, height=HEIGHT, count=4, min_radius=25, max_radius=80, safe_radius=120):
+    # Obstacles as (x, y, radius) tuples, kept clear of each other and of
+    # the player's spawn point in the middle of the arena.
+    rng = WorldRng(seed)
+    cx, cy = width / 2, height / 2
+    layout = []
+    for _ in range(count * 30):
+        if len(layout) == count:
+            break
+        r = rng.uniform(min_radius, max_radius)
+        x = rng.uniform(r, width - r)
+        y = rng.uniform(r, height - r)
+        if hypot(x - cx, y - cy) < safe_radius + r:
+            continue
+        if any(hypot(x - ox, y - oy) < r + orad + 40 for ox, oy, orad in layout):
+            continue
+        layout.append((x, y, r))
+    return layout
+
+
+def run_episode(spec):
+    obstacles = None
+    if spec.layout is not None:
+        obstacles = [Obstacle(x, y, r) for x, y, r in spec.layout]
+    sim = Simulation(
+        spec.width,
+        spec.height,
+        enemy_count=spec.enemy_count,
+        obstacles=obstacles,
+        seed=spec.seed,
+        enemy_params=spec.enemy_params,
+    )
+    result = sim.run(autopilot, dt=spec.dt, max_time=spec.max_time)
+    record = result.as_dict()
+    record["enemy_count"] = spec.enemy_count
+    record["enemy_params"] = dict(spec.enemy_params)
+    return record
+
+
+class FarmStats:
+    def __init__(self):
+        self.episodes = 0
+        self.wins = 0
+        self.losses = 0
+        self.timeouts = 0
+        self.survival_time = 0.0
+        self.kills = 0
+        self.ticks = 0
+
+    def add(self, record):
+        self.episodes += 1
+        outcome = record["outcome"]
+        if outcome == "win":
+            self.wins += 1
+        elif outcome == "loss":
+            self.losses += 1
+        else:
+            self.timeouts += 1
+        self.survival_time += record["survival_time"]
+        self.kills += record["kills"]
+        self.ticks += record["ticks"]
+
+    def as_dict(self):
+        n = max(1, self.episodes)
+        return {
+            "episodes": self.episodes,
+            "wins": self.wins,
+            "losses": self.losses,
+            "timeouts": self.timeouts,
+            "win_rate": self.wins / n,
+            "mean_survival": self.survival_time / n,
+            "mean_kills": self.kills / n,
+            "ticks": self.ticks,
+        }
+
+
+def params_key(params):
+    return tuple(sorted(params.items()))
+
+
+class EpisodeFarm:
+    # Runs independent episodes on a process pool. Submission is windowed so
+    # a generator of millions of specs never sits in memory all at once.
+    def __init__(self, workers=None, window=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.window = window or self.workers * 4
+
+    def imap(self, specs):
+        specs = iter(specs)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            for spec in specs:
+                pending.add(pool.submit(run_episode, spec))
+                if len(pending) >= self.window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def run(self, specs, on_result=None):
+        totals = FarmStats()
+        by_params = {}
+        for record in self.imap(specs):
+            totals.add(record)
+            key = params_key(record["enemy_params"])
+            if key not in by_params:
+                by_params[key] = FarmStats()
+            by_params[key].add(record)
+            if on_result is not None:
+                on_result(record)
+        return totals, by_params
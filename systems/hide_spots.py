@@ -0,0 +1,189 @@
+import numpy as np
+
+from core.kdtree import KDTree
+
+OFFSET_STEP = 1.0
+KD_TREE_MIN_OBSTACLES = 32
+QUERY_BLOCK = 1024
+# Below this many spots a dense argmin beats the grid walk.
+SPOT_GRID_MIN = 64
+SPOTS_PER_CELL = 1.0
+
+
+def _ring(k):
+    # Cell offsets at Chebyshev distance exactly k.
+    if k == 0:
+        return np.zeros((1, 2), dtype=np.int64)
+    side = np.arange(-k, k + 1)
+    edge = np.arange(-k + 1, k)
+    return np.concatenate(
+        (
+            np.column_stack((side, np.full(len(side), -k))),
+            np.column_stack((side, np.full(len(side), k))),
+            np.column_stack((np.full(len(edge), -k), edge)),
+            np.column_stack((np.full(len(edge), k), edge)),
+        )
+    )
+
+
+class SpotGrid:
+    # Spots bucketed into a uniform grid, CSR style (per-cell start offsets
+    # into the spot order), for nearest-spot queries over a whole batch.
+    # Every query scans rings of cells outward from its own cell, all
+    # queries of a ring in one pass, and drops out once its best spot is
+    # closer than anything in the next ring could be. Ties go to the lower
+    # spot index, like an argmin over all spots.
+    def __init__(self, spots, per_cell=SPOTS_PER_CELL):
+        self.spots = spots
+        m = len(spots)
+        self.origin = spots.min(axis=0)
+        extent = np.maximum(spots.max(axis=0) - self.origin, 1.0)
+        self.cell = max(float(np.sqrt(extent[0] * extent[1] * per_cell / m)), float(extent.max()) * per_cell / m)
+        ij = ((spots - self.origin) // self.cell).astype(np.int64)
+        self.nx, self.ny = (int(v) for v in ij.max(axis=0) + 1)
+        flat = ij[:, 0] * self.ny + ij[:, 1]
+        self.order = np.argsort(flat, kind="stable")
+        self.start = np.searchsorted(flat[self.order], np.arange(self.nx * self.ny + 1))
+
+    def nearest(self, positions):
+        # Index of the closest spot to each position.
+        q = len(positions)
+        nx, ny, cell = self.nx, self.ny, self.cell
+        # Queries outside the grid start from the nearest edge cell; a cell
+        # k rings out from there is still at least (k - 1) cells away.
+        ci = np.floor((positions - self.origin) / cell).astype(np.int64)
+        ci[:, 0] = np.clip(ci[:, 0], 0, nx - 1)
+        ci[:, 1] = np.clip(ci[:, 1], 0, ny - 1)
+        last = np.maximum(np.maximum(ci[:, 0], nx - 1 - ci[:, 0]), np.maximum(ci[:, 1], ny - 1 - ci[:, 1]))
+        best_d = np.full(q, np.inf)
+        best_i = np.full(q, -1, dtype=np.intp)
+        active = np.arange(q)
+        k = 0
+        while len(active):
+            off = _ring(k)
+            gx = ci[active, 0, None] + off[:, 0]
+            gy = ci[active, 1, None] + off[:, 1]
+            rows, cols = np.nonzero((gx >= 0) & (gx < nx) & (gy >= 0) & (gy < ny))
+            cells = gx[rows, cols] * ny + gy[rows, cols]
+            lo = self.start[cells]
+            counts = self.start[cells + 1] - lo
+            total = int(counts.sum())
+            if total:
+                # Candidates come out grouped by query (rows are sorted), so
+                # per-query minima are segment reductions.
+                who = np.repeat(active[rows], counts)
+                local = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                sid = self.order[np.repeat(lo, counts) + local]
+                diff = positions[who] - self.spots[sid]
+                d = diff[:, 0] ** 2 + diff[:, 1] ** 2
+                head = np.flatnonzero(np.r_[True, who[1:] != who[:-1]])
+                size = np.diff(np.r_[head, total])
+                d_min = np.minimum.reduceat(d, head)
+                tied = np.where(d == np.repeat(d_min, size), sid, len(self.spots))
+                sid = np.minimum.reduceat(tied, head)
+                who, d = who[head], d_min
+                better = (d < best_d[who]) | ((d == best_d[who]) & (sid < best_i[who]))
+                best_d[who[better]] = d[better]
+                best_i[who[better]] = sid[better]
+            done = (best_d[active] < (k * cell) ** 2) | (k >= last[active])
+            active = active[~done]
+            k += 1
+        return best_i
+
+
+class HideSpotTable:
+    # Hide spots behind every obstacle, as seen from the player, for the
+    # current tick. A spot only depends on the player position and on the
+    # enemy's radius + hide_distance, so spots are cached per quantized
+    # offset and shared by every hiding enemy.
+    def __init__(self, obstacles, offset_step=OFFSET_STEP, kd_tree_min=KD_TREE_MIN_OBSTACLES, grid_min=SPOT_GRID_MIN):
+        self.offset_step = offset_step
+        self.kd_tree_min = kd_tree_min
+        self.grid_min = grid_min
+        self.cx = np.array([ob.collider.position.x for ob in obstacles], dtype=float)
+        self.cy = np.array([ob.collider.position.y for ob in obstacles], dtype=float)
+        self.radius = np.array([ob.collider.radius for ob in obstacles], dtype=float)
+
+        self.player_key = None
+        self._dir = np.zeros((0, 2))
+        self._base = np.zeros((0, 2))
+        self._radius = np.zeros(0)
+        self._spots = {}
+        self._trees = {}
+        self._grids = {}
+
+    def rebuild(self, player_pos):
+        key = (player_pos.x, player_pos.y)
+        if key == self.player_key:
+            return self
+        self.player_key = key
+        dx = self.cx - player_pos.x
+        dy = self.cy - player_pos.y
+        l = np.hypot(dx, dy)
+        keep = l > 0
+        self._dir = np.column_stack((dx[keep] / l[keep], dy[keep] / l[keep]))
+        self._base = np.column_stack((self.cx[keep], self.cy[keep]))
+        self._radius = self.radius[keep]
+        self._spots.clear()
+        self._trees.clear()
+        self._grids.clear()
+        return self
+
+    def _key(self, offset):
+        return int(round(offset / self.offset_step))
+
+    def spots(self, offset):
+        key = self._key(offset)
+        spots = self._spots.get(key)
+        if spots is None:
+            reach = self._radius + key * self.offset_step
+            spots = self._base + self._dir * reach[:, None]
+            self._spots[key] = spots
+        return spots
+
+    def nearest(self, x, y, offset):
+        # Closest spot to (x, y) or None when no obstacle casts one.
+        spots = self.spots(offset)
+        m = len(spots)
+        if m == 0:
+            return None
+        if m >= self.kd_tree_min:
+            key = self._key(offset)
+            tree = self._trees.get(key)
+            if tree is None:
+                tree = self._trees[key] = KDTree(spots)
+            i, _ = tree.nearest(x, y)
+        else:
+            d = (spots[:, 0] - x) ** 2 + (spots[:, 1] - y) ** 2
+            i = int(np.argmin(d))
+        return spots[i]
+
+    def nearest_many(self, positions, offsets):
+        # Vectorized nearest spot for a batch of enemies. Returns (spots,
+        # found). Small maps take a blocked argmin over every spot; from
+        # grid_min spots on, a SpotGrid keeps the cost near linear in the
+        # number of enemies.
+        n = len(positions)
+        out = np.zeros((n, 2))
+        found = np.zeros(n, dtype=bool)
+        if n == 0 or len(self._base) == 0:
+            return out, found
+        keys = np.rint(offsets / self.offset_step).astype(np.int64)
+        # Enemies mostly share one offset; skip the grouping then.
+        shared = (keys == keys[0]).all()
+        for key in keys[:1] if shared else np.unique(keys):
+            group = np.arange(n) if shared else np.flatnonzero(keys == key)
+            spots = self.spots(key * self.offset_step)
+            if len(spots) >= self.grid_min:
+                grid = self._grids.get(key)
+                if grid is None:
+                    grid = self._grids[key] = SpotGrid(spots)
+                out[group] = spots[grid.nearest(positions[group])]
+            else:
+                for b0 in range(0, len(group), QUERY_BLOCK):
+                    idx = group[b0 : b0 + QUERY_BLOCK]
+                    p = positions[idx]
+                    d = (p[:, None, 0] - spots[None, :, 0]) ** 2 + (p[:, None, 1] - spots[None, :, 1]) ** 2
+                    out[idx] = spots[np.argmin(d, axis=1)]
+            found[group] = True
+        return out, found
@@ -0,0 +1,123 @@
+from math import sqrt
+
+import numpy as np
+
+NAV_CELL_SIZE = 32
+NAV_CLEARANCE = 16
+
+# (di, dj, cost) for the 8 grid neighbours.
+_STEPS = (
+    (1, 0, 1.0),
+    (-1, 0, 1.0),
+    (0, 1, 1.0),
+    (0, -1, 1.0),
+    (1, 1, sqrt(2.0)),
+    (1, -1, sqrt(2.0)),
+    (-1, 1, sqrt(2.0)),
+    (-1, -1, sqrt(2.0)),
+)
+
+
+def _shifted(a, di, dj, fill):
+    # b[i, j] = a[i + di, j + dj], with `fill` past the edges.
+    out = np.full(a.shape, fill, dtype=a.dtype)
+    nx, ny = a.shape
+    out[max(0, -di) : nx - max(0, di), max(0, -dj) : ny - max(0, dj)] = a[
+        max(0, di) : nx + min(0, di), max(0, dj) : ny + min(0, dj)
+    ]
+    return out
+
+
+class FlowField:
+    # Shared route to the player for every attacker. The arena is a grid of
+    # cells, blocked where a cell centre is within an obstacle's radius plus
+    # `clearance`; the blocked mask is built once per map. update() floods
+    # path distances out from the player's cell (8-connected, no corner
+    # cutting) and points every cell at its cheapest neighbour, but only
+    # when the player has moved to a different cell.
+    def __init__(self, obstacles, width, height, cell_size=NAV_CELL_SIZE, clearance=NAV_CLEARANCE):
+        self.cell_size = cell_size
+        nx = int(np.ceil(width / cell_size))
+        ny = int(np.ceil(height / cell_size))
+        self.shape = (nx, ny)
+
+        cx = (np.arange(nx) + 0.5) * cell_size
+        cy = (np.arange(ny) + 0.5) * cell_size
+        blocked = np.zeros((nx, ny), dtype=bool)
+        for ob in obstacles:
+            c = ob.collider.position
+            reach = ob.collider.radius + clearance
+            blocked |= (cx[:, None] - c.x) ** 2 + (cy[None, :] - c.y) ** 2 < reach * reach
+        self.blocked = blocked
+        free = ~blocked
+
+        # A diagonal step is allowed only if both cells it squeezes past are free.
+        self._passable = []
+        for di, dj, _ in _STEPS:
+            if di and dj:
+                self._passable.append(_shifted(free, di, 0, False) & _shifted(free, 0, dj, False))
+            else:
+                self._passable.append(None)
+
+        self.target_cell = None
+        self.distance = np.full(self.shape, np.inf)
+        self.flow = np.zeros(self.shape + (2,))
+        self.rebuilds = 0
+
+    def cell_of(self, x, y):
+        nx, ny = self.shape
+        i = min(max(int(x // self.cell_size), 0), nx - 1)
+        j = min(max(int(y // self.cell_size), 0), ny - 1)
+        return i, j
+
+    def update(self, target):
+        cell = self.cell_of(target.x, target.y)
+        if cell == self.target_cell:
+            return self
+        self.target_cell = cell
+        self.rebuilds += 1
+
+        dist = np.full(self.shape, np.inf)
+        dist[cell] = 0.0
+        while True:
+            best = dist.copy()
+            for (di, dj, cost), passable in zip(_STEPS, self._passable):
+                via = _shifted(dist, di, dj, np.inf) + cost
+                if passable is not None:
+                    via[~passable] = np.inf
+                np.minimum(best, via, out=best)
+            best[self.blocked] = np.inf
+            best[cell] = 0.0
+            if np.array_equal(best, dist):
+                break
+            dist = best
+        self.distance = dist
+
+        # Blocked cells get a direction too, so an enemy pushed into an
+        # obstacle's margin still knows the way out.
+        options = np.empty((len(_STEPS),) + self.shape)
+        for k, ((di, dj, cost), passable) in enumerate(zip(_STEPS, self._passable)):
+            via = _shifted(dist, di, dj, np.inf) + cost
+            if passable is not None:
+                via[~passable] = np.inf
+            options[k] = via
+        choice = np.argmin(options, axis=0)
+        steps = np.array([(di, dj) for di, dj, _ in _STEPS], dtype=float)
+        steps /= np.hypot(steps[:, 0], steps[:, 1])[:, None]
+        flow = steps[choice]
+        reachable = np.isfinite(np.take_along_axis(options, choice[None], axis=0)[0])
+        flow[~reachable] = 0.0
+        flow[cell] = 0.0
+        self.flow = flow
+        return self
+
+    def directions(self, positions):
+        # Unit direction to follow from each position, or (0, 0) where the
+        # field has no route (the target's own cell, or walled off).
+        nx, ny = self.shape
+        i = np.clip((positions[:, 0] // self.cell_size).astype(np.intp), 0, nx - 1)
+        j = np.clip((positions[:, 1] // self.cell_size).astype(np.intp), 0, ny - 1)
+        return self.flow[i, j]
+
+    def direction(self, x, y):
+        return self.flow[self.cell_of(x, y)]
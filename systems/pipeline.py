@@ -0,0 +1,66 @@
+import copy
+
+import numpy as np
+
+from entities.player import Player
+from systems.timestep import lerp, lerp_angle
+
+
+class FrameSwarm:
+    __slots__ = ("radius", "count")
+
+    def __init__(self):
+        self.radius = np.zeros(0)
+        self.count = 0
+
+
+class FrameState:
+    # Read-only copy of what WorldRenderer needs from one tick, shaped like
+    # the Simulation attributes it reads (interpolated(), swarm.radius and
+    # swarm.count, player.draw, railgun.draw). Arrays are reused between
+    # captures and only grow.
+    def __init__(self):
+        self.swarm = FrameSwarm()
+        self.prev_position = np.zeros((0, 2))
+        self.position = np.zeros((0, 2))
+        self.prev_player = (0.0, 0.0, 0.0)
+        self.player_pose = (0.0, 0.0, 0.0)
+        self.player = Player(0, 0)
+        self.railgun = None
+        self.ticks = 0
+        self.alpha = 1.0
+
+    def capture(self, sim, alpha):
+        swarm = sim.swarm
+        n = swarm.count
+        if len(self.position) < n:
+            size = max(n, 2 * len(self.position))
+            self.prev_position = np.zeros((size, 2))
+            self.position = np.zeros((size, 2))
+            self.swarm.radius = np.zeros(size)
+        self.prev_position[:n] = swarm.prev_position[:n]
+        self.position[:n] = swarm.position[:n]
+        self.swarm.radius[:n] = swarm.radius[:n]
+        self.swarm.count = n
+
+        player = sim.player
+        self.prev_player = sim.prev_player
+        self.player_pose = (player.position.x, player.position.y, player.angle)
+        self.player.collider.radius = player.collider.radius
+        # Railgun state is a handful of scalars and freshly made vectors.
+        self.railgun = copy.copy(sim.railgun)
+        self.ticks = sim.ticks
+        self.alpha = alpha
+        return self
+
+    def interpolated(self, alpha):
+        px, py, angle = self.prev_player
+        x, y, a = self.player_pose
+        n = self.swarm.count
+        prev = self.prev_position[:n]
+        return (
+            lerp(px, x, alpha),
+            lerp(py, y, alpha),
+            lerp_angle(angle, a, alpha),
+            prev + (self.position[:n] - prev) * alpha,
+        )
@@ -0,0 +1,206 @@
+import csv
+import json
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+PERCENTILES = (50, 95, 99)
+
+
+class _Scope:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, perf_counter() - self.start)
+        return False
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class NullProfiler:
+    # Stand-in when profiling is off; every call is a no-op.
+    enabled = False
+
+    def scope(self, name):
+        return _NULL_SCOPE
+
+    def record(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def end_frame(self):
+        pass
+
+
+class FrameProfiler:
+    # Named timing scopes with rolling windows of the last `window` samples
+    # per scope, plus free-running call counters.
+    enabled = True
+
+    def __init__(self, window=300):
+        self.window = window
+        self.samples = {}
+        self.counters = {}
+        self.frame_counters = {}
+        self.frames = 0
+        self._scopes = {}
+
+    def scope(self, name):
+        # Scopes are reused per name; they are not re-entrant for one name.
+        s = self._scopes.get(name)
+        if s is None:
+            s = self._scopes[name] = _Scope(self, name)
+        return s
+
+    def record(self, name, seconds):
+        q = self.samples.get(name)
+        if q is None:
+            q = self.samples[name] = deque(maxlen=self.window)
+        q.append(seconds)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def end_frame(self):
+        self.frames += 1
+        for name, total in self.counters.items():
+            q = self.frame_counters.get(name)
+            if q is None:
+                q = self.frame_counters[name] = deque(maxlen=self.window)
+            q.append(total)
+        self.counters = dict.fromkeys(self.counters, 0)
+
+    def stats(self, name):
+        q = self.samples.get(name)
+        if not q:
+            return None
+        ordered = sorted(q)
+        n = len(ordered)
+        out = {"count": n, "mean_ms": sum(ordered) / n * 1000.0, "max_ms": ordered[-1] * 1000.0}
+        for p in PERCENTILES:
+            out[f"p{p}_ms"] = ordered[min(n - 1, int(p / 100.0 * n))] * 1000.0
+        return out
+
+    def report(self):
+        scopes = {name: self.stats(name) for name in self.samples}
+        calls = {
+            name: sum(q) / len(q)
+            for name, q in self.frame_counters.items()
+            if q
+        }
+        return {"frames": self.frames, "scopes": scopes, "calls_per_frame": calls}
+
+    def export_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+    def export_csv(self, path):
+        report = self.report()
+        columns = ["count", "mean_ms", "max_ms"] + [f"p{p}_ms" for p in PERCENTILES]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["kind", "name"] + columns)
+            for name, s in sorted(report["scopes"].items()):
+                writer.writerow(["scope", name] + [round(s[c], 4) for c in columns])
+            for name, calls in sorted(report["calls_per_frame"].items()):
+                writer.writerow(["calls", name, round(calls, 2)] + [""] * (len(columns) - 1))
+
+    def export(self, path):
+        if path.endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
+
+    def draw_overlay(self, screen, font, pos=(10, 10)):
+        lines = ["system            p50    p95    p99  (ms)"]
+        for name in sorted(self.samples):
+            s = self.stats(name)
+            lines.append(f"{name:<16}{s['p50_ms']:>6.2f} {s['p95_ms']:>6.2f} {s['p99_ms']:>6.2f}")
+        for name, calls in sorted(self.report()["calls_per_frame"].items()):
+            lines.append(f"{name:<16}{calls:>8.0f} calls/frame")
+
+        x, y = pos
+        for line in lines:
+            surface = font.render(line, True, (220, 220, 220))
+            screen.blit(surface, (x, y))
+            y += surface.get_height()
+
+
+@contextmanager
+def count_calls(profiler, namespace, names, prefix=""):
+    # Wraps namespace.<name> (module or class) with a call counter for the
+    # duration of the with block, then puts the originals back.
+    originals = {}
+    for name in names:
+        fn = getattr(namespace, name)
+        originals[name] = fn
+        key = prefix + name
+
+        def wrapper(*args, _fn=fn, _key=key, **kwargs):
+            profiler.count(_key)
+            return _fn(*args, **kwargs)
+
+        setattr(namespace, name, wrapper)
+    try:
+        yield profiler
+    finally:
+        for name, fn in originals.items():
+            setattr(namespace, name, fn)
+
+
+STEERING_FUNCTIONS = (
+    "wander",
+    "seek",
+    "separate",
+    "cohesion",
+    "avoid_obstacles",
+    "center_bias",
+    "visible_to_player",
+    "flee_from_player",
+    "hide_from_player",
+)
+
+
+@contextmanager
+def count_steering_calls(profiler):
+    # Per-call counters for the steering helpers, covering both the scalar
+    # Enemy path and the batched swarm passes, while the with block runs.
+    from entities import enemy
+    from systems import enemy_steering
+    from systems.enemy_swarm import EnemySwarm
+
+    with ExitStack() as stack:
+        stack.enter_context(count_calls(profiler, enemy_steering, STEERING_FUNCTIONS, "steer."))
+        stack.enter_context(count_calls(profiler, enemy_steering, ("steer_attack", "steer_hide", "heading"), "steer."))
+        stack.enter_context(count_calls(profiler, enemy, ("steer_attack", "steer_hide", "heading"), "steer."))
+        stack.enter_context(
+            count_calls(
+                profiler,
+                EnemySwarm,
+                ("_separate_and_cohesion", "_avoid_obstacles", "_hide_from_player", "_flee_from_player", "_seek"),
+                "swarm.",
+            )
+        )
+        yield profiler
@@ -1,6 +1,12 @@
-import pygame
-from math import cos, sin
+from math import cos, hypot, inf, sin, sqrt
+
+import numpy as np
+
 from core.vector2 import Vector2
+from systems.raycast import RayBroadPhase
+
+# Start each bounce this far off the obstacle so it doesn't re-hit it.
+RICOCHET_OFFSET = 0.01
 
 
 class Railgun:
@@ -14,7 +20,7 @@ class Railgun:
         self.beam_time = 0.1
         self.beam_timer = 0
 
-    def fire(self, player, enemies, obstacles):
+    def fire(self, player, enemies, obstacles, broadphase=None):
         start = player.get_tip()
         angle = player.angle
 
@@ -23,7 +29,7 @@ class Railgun:
             start.y + sin(angle) * self.beam_length
         )
 
-        hit_enemy, enemy_point, obstacle_point = self._find_first_hit(start, raw_end, enemies, obstacles)
+        hit_enemy, enemy_point, obstacle_point = self._find_first_hit(start, raw_end, enemies, obstacles, broadphase)
 
         if hit_enemy:
             end = enemy_point
@@ -38,110 +44,179 @@ class Railgun:
 
         return [hit_enemy] if hit_enemy else []
 
-    def _find_first_hit(self, start, end, enemies, obstacles):
+    def _find_first_hit(self, start, end, enemies, obstacles, broadphase=None):
+        dx = end.x - start.x
+        dy = end.y - start.y
+        length = hypot(dx, dy)
+        if length == 0:
+            return None, None, None
+        dx /= length
+        dy /= length
+
+        if broadphase is not None:
+            # The broad phase's targets must be the enemies passed in.
+            index, enemy_t, ob_t = broadphase.first_hit(start.x, start.y, dx, dy, length)
+            if ob_t <= enemy_t and ob_t != float("inf"):
+                return None, None, self._point_along(start, dx, dy, ob_t)
+            if index is not None and enemy_t != float("inf"):
+                return broadphase.targets[index], self._point_along(start, dx, dy, enemy_t), None
+            return None, None, None
+
         closest_enemy = None
-        closest_enemy_point = None
         closest_enemy_dist = float("inf")
-
-        closest_ob_point = None
         closest_ob_dist = float("inf")
 
         # Obstacles block the shot
         for ob in obstacles:
-            hit_point = self._ray_circle_intersection(start, end, ob)
-            if hit_point is not None:
-                dist = hit_point.sub(start).length()
-                if dist < closest_ob_dist:
-                    closest_ob_point = hit_point
-                    closest_ob_dist = dist
+            t = self._ray_circle_distance(start, dx, dy, length, ob)
+            if t is not None and t < closest_ob_dist:
+                closest_ob_dist = t
 
         # Enemies can be hit but the beam stops at the first one
         for enemy in enemies:
-            hit_point = self._ray_circle_intersection(start, end, enemy)
-            if hit_point is not None:
-                dist = hit_point.sub(start).length()
-                if dist < closest_enemy_dist:
-                    closest_enemy = enemy
-                    closest_enemy_point = hit_point
-                    closest_enemy_dist = dist
+            t = self._ray_circle_distance(start, dx, dy, length, enemy)
+            if t is not None and t < closest_enemy_dist:
+                closest_enemy = enemy
+                closest_enemy_dist = t
 
         # If an obstacle is closer than the nearest enemy, no enemy is hit.
-        if closest_ob_point is not None and closest_ob_dist <= closest_enemy_dist:
-            return None, None, closest_ob_point
+        if closest_ob_dist <= closest_enemy_dist and closest_ob_dist != float("inf"):
+            return None, None, self._point_along(start, dx, dy, closest_ob_dist)
 
         if closest_enemy:
-            return closest_enemy, closest_enemy_point, None
+            return closest_enemy, self._point_along(start, dx, dy, closest_enemy_dist), None
 
         return None, None, None
 
-    def _ray_circle_intersection(self, start, end, obstacle):
-        cx, cy = obstacle.collider.position.x, obstacle.collider.position.y
-        r = obstacle.collider.radius
+    def _point_along(self, start, dx, dy, t):
+        return Vector2(start.x + dx * t, start.y + dy * t)
 
-        d = end.sub(start)
-        d_len = d.length()
-        d_norm = d.normalized()
+    def _ray_circle_distance(self, start, dx, dy, length, target):
+        c = target.collider.position
+        r = target.collider.radius
 
-        f = start.sub(Vector2(cx, cy))
+        fx = start.x - c.x
+        fy = start.y - c.y
 
-        a = d_norm.x * d_norm.x + d_norm.y * d_norm.y
-        b = 2 * (f.x * d_norm.x + f.y * d_norm.y)
-        c = f.x * f.x + f.y * f.y - r * r
+        b = fx * dx + fy * dy
+        cc = fx * fx + fy * fy - r * r
 
-        disc = b*b - 4*a*c
+        disc = b * b - cc
         if disc < 0:
             return None
 
-        disc = disc ** 0.5
-
-        t1 = (-b - disc) / (2 * a)
-        t2 = (-b + disc) / (2 * a)
-
-        t_candidates = [t1, t2]
-        best_t = None
-
-        for t in t_candidates:
-            if t >= 0:
-                hit = start.add(d_norm.mul(t))
-                dist = hit.sub(start).length()
-
-                if dist <= d_len:
-                    if best_t is None or dist < best_t[0]:
-                        best_t = (dist, hit)
-
-        if best_t:
-            return best_t[1]
-
+        disc = sqrt(disc)
+        t1 = -b - disc
+        if 0 <= t1 <= length:
+            return t1
+        t2 = -b + disc
+        if 0 <= t2 <= length:
+            return t2
         return None
 
     def _ray_hits_circle(self, start, end, enemy):
         ray = end.sub(start)
-        to_enemy = enemy.position.sub(start)
-
-        ray_len = ray.length()
-        if ray_len == 0:
+        ray_len_sq = ray.length_sq()
+        if ray_len_sq == 0:
             return False
 
-        ray_dir = ray.normalized()
-
-        proj = to_enemy.x * ray_dir.x + to_enemy.y * ray_dir.y
-        proj = max(0, min(ray_len, proj))
-
-        closest = start.add(ray_dir.mul(proj))
-        dist = enemy.position.sub(closest).length()
+        to_enemy = enemy.position.sub(start)
+        proj = max(0, min(ray_len_sq, to_enemy.dot(ray))) / ray_len_sq
 
-        return dist <= enemy.collider.radius
+        closest = start.add(ray.imul(proj))
+        r = enemy.collider.radius
+        return enemy.position.dist_sq(closest) <= r * r
 
     def update(self, dt):
         if self.beam_timer > 0:
             self.beam_timer -= dt
 
     def draw(self, screen):
+        import pygame
+
         if self.beam_timer > 0 and self.last_beam_start and self.last_beam_end:
-            pygame.draw.line(
+            return pygame.draw.line(
                 screen,
                 self.color,
                 (self.last_beam_start.x, self.last_beam_start.y),
                 (self.last_beam_end.x, self.last_beam_end.y),
                 self.thickness
             )
+
+
+class PiercingRailgun(Railgun):
+    # Railgun that keeps going through enemies, up to `pierce` of them, and
+    # bounces off obstacles up to `bounces` times. Each leg of the beam
+    # asks the broad phase for every enemy it enters before the next
+    # obstacle in one batch, already sorted, so a shot costs one sort per
+    # leg however many enemies it passes through. Bounces reuse the same
+    # buckets; an enemy is only killed once per shot. A beam that starts
+    # inside an obstacle stops where it leaves it rather than bouncing.
+    def __init__(self, beam_length=1200, color=(255, 120, 40), thickness=2, pierce=inf, bounces=0):
+        if pierce < 1:
+            raise ValueError(f"pierce must be at least 1, got {pierce}")
+        super().__init__(beam_length, color, thickness)
+        self.pierce = pierce
+        self.bounces = bounces
+        self.last_beam_path = []
+
+    def fire(self, player, enemies, obstacles, broadphase=None):
+        if broadphase is None:
+            broadphase = RayBroadPhase(obstacles).set_targets(enemies)
+        start = player.get_tip()
+        ox, oy = start.x, start.y
+        dx, dy = cos(player.angle), sin(player.angle)
+        remaining = float(self.beam_length)
+        budget = self.pierce
+        killed = np.zeros(len(broadphase.targets), dtype=bool)
+        order = []
+        path = [start]
+
+        for leg in range(self.bounces + 1):
+            ids, t, ob_index, ob_t = broadphase.hits_along(ox, oy, dx, dy, remaining, skip=killed)
+            if len(ids) >= budget:
+                ids = ids[: int(budget)]
+                killed[ids] = True
+                order.extend(ids.tolist())
+                path.append(self._point_along(Vector2(ox, oy), dx, dy, float(t[len(ids) - 1])))
+                break
+            killed[ids] = True
+            order.extend(ids.tolist())
+            budget -= len(ids)
+            if ob_index is None:
+                path.append(self._point_along(Vector2(ox, oy), dx, dy, remaining))
+                break
+
+            hit = self._point_along(Vector2(ox, oy), dx, dy, ob_t)
+            path.append(hit)
+            remaining -= ob_t
+            if leg == self.bounces or remaining <= 0:
+                break
+            grid = broadphase.obstacle_grid
+            nx = hit.x - grid.cx[ob_index]
+            ny = hit.y - grid.cy[ob_index]
+            norm = hypot(nx, ny) or 1.0
+            nx /= norm
+            ny /= norm
+            into = dx * nx + dy * ny
+            if into >= 0:
+                # Leaving the obstacle, not striking it.
+                break
+            dx -= 2 * into * nx
+            dy -= 2 * into * ny
+            ox = hit.x + nx * RICOCHET_OFFSET
+            oy = hit.y + ny * RICOCHET_OFFSET
+
+        self.last_beam_path = path
+        self.last_beam_start = path[0]
+        self.last_beam_end = path[-1]
+        self.beam_timer = self.beam_time
+        return [broadphase.targets[i] for i in order]
+
+    def draw(self, screen):
+        import pygame
+
+        if self.beam_timer > 0 and len(self.last_beam_path) > 1:
+            return pygame.draw.lines(
+                screen, self.color, False, [(p.x, p.y) for p in self.last_beam_path], self.thickness
+            )
@@ -0,0 +1,229 @@
+from math import floor, inf
+
+import numpy as np
+
+RAY_CELL_SIZE = 64
+_KEY_OFFSET = 1 << 20
+_KEY_STRIDE = 1 << 21
+
+
+def _cell_key(ix, iy):
+    return (ix + _KEY_OFFSET) * _KEY_STRIDE + (iy + _KEY_OFFSET)
+
+
+def ray_circle_entries(ox, oy, dx, dy, length, cx, cy, r):
+    # Distance along a unit-direction ray to the first intersection with each
+    # circle within [0, length], or inf. A ray starting inside a circle hits
+    # it where it leaves, same as Railgun._ray_circle_distance.
+    fx = ox - cx
+    fy = oy - cy
+    b = fx * dx + fy * dy
+    c = fx * fx + fy * fy - r * r
+    disc = b * b - c
+    t = np.full(len(cx), inf)
+    ok = disc >= 0
+    if not ok.any():
+        return t
+    s = np.sqrt(disc[ok])
+    t1 = -b[ok] - s
+    t2 = -b[ok] + s
+    t[ok] = np.where(
+        (t1 >= 0) & (t1 <= length),
+        t1,
+        np.where((t2 >= 0) & (t2 <= length), t2, inf),
+    )
+    return t
+
+
+def ray_cells(ox, oy, dx, dy, length, cell_size):
+    # Grid cells crossed by a ray in order (Amanatides & Woo), with the ray
+    # distances at which it enters and leaves each one.
+    ix = floor(ox / cell_size)
+    iy = floor(oy / cell_size)
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    if dx != 0:
+        next_x = (ix + (1 if dx > 0 else 0)) * cell_size
+        t_max_x = (next_x - ox) / dx
+        t_delta_x = cell_size / abs(dx)
+    else:
+        t_max_x = t_delta_x = inf
+    if dy != 0:
+        next_y = (iy + (1 if dy > 0 else 0)) * cell_size
+        t_max_y = (next_y - oy) / dy
+        t_delta_y = cell_size / abs(dy)
+    else:
+        t_max_y = t_delta_y = inf
+
+    t = 0.0
+    while t <= length:
+        t_exit = min(t_max_x, t_max_y)
+        yield ix, iy, t, t_exit
+        if t_max_x < t_max_y:
+            ix += step_x
+            t_max_x += t_delta_x
+        else:
+            iy += step_y
+            t_max_y += t_delta_y
+        t = t_exit
+
+
+class CircleGrid:
+    # Circles bucketed into every grid cell their bounding box touches, kept
+    # as one sorted key array (CSR style) so a rebuild is fully vectorized.
+    def __init__(self, cell_size=RAY_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cx = np.zeros(0)
+        self.cy = np.zeros(0)
+        self.r = np.zeros(0)
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._ids = np.zeros(0, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.cx)
+
+    def build(self, cx, cy, r):
+        s = self.cell_size
+        self.cx = np.asarray(cx, dtype=float)
+        self.cy = np.asarray(cy, dtype=float)
+        self.r = np.broadcast_to(np.asarray(r, dtype=float), self.cx.shape).copy()
+        if len(self.cx) == 0:
+            self._keys = np.zeros(0, dtype=np.int64)
+            self._ids = np.zeros(0, dtype=np.intp)
+            return self
+
+        x0 = np.floor((self.cx - self.r) / s).astype(np.int64)
+        x1 = np.floor((self.cx + self.r) / s).astype(np.int64)
+        y0 = np.floor((self.cy - self.r) / s).astype(np.int64)
+        y1 = np.floor((self.cy + self.r) / s).astype(np.int64)
+        w = x1 - x0 + 1
+        h = y1 - y0 + 1
+        counts = w * h
+
+        ids = np.repeat(np.arange(len(self.cx)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        hh = np.repeat(h, counts)
+        ix = np.repeat(x0, counts) + local // hh
+        iy = np.repeat(y0, counts) + local % hh
+        keys = _cell_key(ix, iy)
+
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._ids = ids[order]
+        return self
+
+    def cell_items(self, ix, iy):
+        key = _cell_key(ix, iy)
+        keys = self._keys
+        lo = np.searchsorted(keys, key, side="left")
+        if lo == len(keys) or keys[lo] != key:
+            return self._ids[:0]
+        hi = np.searchsorted(keys, key, side="right")
+        return self._ids[lo:hi]
+
+    def point_items(self, x, y):
+        # Every (point, circle) pair where the circle's box touches the
+        # point's cell, for a whole batch of points in one pass.
+        s = self.cell_size
+        keys = _cell_key(np.floor(x / s).astype(np.int64), np.floor(y / s).astype(np.int64))
+        lo = np.searchsorted(self._keys, keys, side="left")
+        hi = np.searchsorted(self._keys, keys, side="right")
+        counts = hi - lo
+        points = np.repeat(np.arange(len(keys)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return points, self._ids[np.repeat(lo, counts) + local]
+
+
+class RayBroadPhase:
+    # Static obstacles are bucketed once; targets are re-bucketed whenever
+    # set_targets() is called (once per tick is enough for any number of
+    # shots). first_hit() walks the beam's cells in order, tests each cell's
+    # new candidates in one vectorized pass, and stops as soon as a hit lies
+    # before the end of the current cell.
+    def __init__(self, obstacles, cell_size=RAY_CELL_SIZE):
+        self.cell_size = cell_size
+        self.obstacle_grid = CircleGrid(cell_size).build(
+            [ob.collider.position.x for ob in obstacles],
+            [ob.collider.position.y for ob in obstacles],
+            [ob.collider.radius for ob in obstacles],
+        )
+        self.target_grid = CircleGrid(cell_size)
+        self.targets = []
+
+    def set_targets(self, targets, positions=None, radii=None):
+        if positions is None:
+            positions = np.array([(t.position.x, t.position.y) for t in targets], dtype=float).reshape(-1, 2)
+        if radii is None:
+            radii = np.array([t.collider.radius for t in targets], dtype=float)
+        self.targets = list(targets)
+        self.target_grid.build(positions[:, 0].copy(), positions[:, 1].copy(), radii)
+        return self
+
+    def _closest(self, grid, ids, seen, ox, oy, dx, dy, length):
+        fresh = ids[~seen[ids]]
+        if len(fresh) == 0:
+            return None, inf
+        seen[fresh] = True
+        t = ray_circle_entries(ox, oy, dx, dy, length, grid.cx[fresh], grid.cy[fresh], grid.r[fresh])
+        k = int(np.argmin(t))
+        return int(fresh[k]), float(t[k])
+
+    def first_hit(self, ox, oy, dx, dy, length):
+        # Returns (target index or None, target distance, obstacle distance).
+        obstacles = self.obstacle_grid
+        targets = self.target_grid
+        seen_ob = np.zeros(len(obstacles), dtype=bool)
+        seen_target = np.zeros(len(targets), dtype=bool)
+        best_ob = inf
+        best_target = inf
+        best_index = None
+
+        for ix, iy, _, t_exit in ray_cells(ox, oy, dx, dy, length, self.cell_size):
+            if len(obstacles):
+                _, t = self._closest(obstacles, obstacles.cell_items(ix, iy), seen_ob, ox, oy, dx, dy, length)
+                if t < best_ob:
+                    best_ob = t
+            if len(targets):
+                i, t = self._closest(targets, targets.cell_items(ix, iy), seen_target, ox, oy, dx, dy, length)
+                if t < best_target:
+                    best_target = t
+                    best_index = i
+            if min(best_ob, best_target) <= t_exit:
+                break
+
+        return best_index, best_target, best_ob
+
+    def hits_along(self, ox, oy, dx, dy, length, skip=None):
+        # Every target the ray enters before the first obstacle, nearest
+        # first: (target indices, entry distances, obstacle index or None,
+        # obstacle distance). The walk stops at the cell holding the first
+        # obstacle hit; target candidates from all cells before it are
+        # tested in one batch and sorted once. `skip` masks out targets.
+        obstacles = self.obstacle_grid
+        targets = self.target_grid
+        seen_ob = np.zeros(len(obstacles), dtype=bool)
+        seen_target = np.zeros(len(targets), dtype=bool) if skip is None else skip.copy()
+        best_ob = inf
+        ob_index = None
+        candidates = []
+
+        for ix, iy, _, t_exit in ray_cells(ox, oy, dx, dy, length, self.cell_size):
+            if len(obstacles):
+                i, t = self._closest(obstacles, obstacles.cell_items(ix, iy), seen_ob, ox, oy, dx, dy, length)
+                if t < best_ob:
+                    best_ob = t
+                    ob_index = i
+            if len(targets):
+                ids = targets.cell_items(ix, iy)
+                fresh = ids[~seen_target[ids]]
+                seen_target[fresh] = True
+                candidates.append(fresh)
+            if best_ob <= t_exit:
+                break
+
+        ids = np.concatenate(candidates) if candidates else np.zeros(0, dtype=np.intp)
+        t = ray_circle_entries(ox, oy, dx, dy, length, targets.cx[ids], targets.cy[ids], targets.r[ids])
+        before = t < best_ob
+        ids, t = ids[before], t[before]
+        order = np.argsort(t, kind="stable")
+        return ids[order], t[order], ob_index, best_ob
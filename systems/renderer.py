@@ -0,0 +1,79 @@
+from math import ceil
+
+import numpy as np
+import pygame
+
+from entities.enemy import ENEMY_COLOR
+
+BACKGROUND_COLOR = (25, 25, 30)
+SPRITE_KEY = (255, 0, 255)
+
+
+class WorldRenderer:
+    # Obstacles never move, so they are painted once onto a background
+    # surface. Enemies are pre-rendered colorkeyed RLE sprites (one per
+    # radius) blitted in a single Surface.blits call. With dirty_rects on,
+    # only the areas drawn this frame or last frame are restored and pushed
+    # to the display.
+    def __init__(self, width, height, obstacles, dirty_rects=False):
+        self.size = (width, height)
+        self.dirty_rects = dirty_rects
+        self.background = pygame.Surface(self.size).convert()
+        self.background.fill(BACKGROUND_COLOR)
+        for ob in obstacles:
+            ob.draw(self.background)
+
+        self._sprites = {}
+        self._drawn = []
+        self._full = True
+
+    def invalidate(self):
+        # Next frame repaints and presents the whole screen.
+        self._full = True
+
+    def _sprite(self, radius):
+        sprite = self._sprites.get(radius)
+        if sprite is None:
+            r = int(ceil(radius))
+            sprite = pygame.Surface((2 * r, 2 * r)).convert()
+            sprite.fill(SPRITE_KEY)
+            pygame.draw.circle(sprite, ENEMY_COLOR, (r, r), radius)
+            sprite.set_colorkey(SPRITE_KEY, pygame.RLEACCEL)
+            self._sprites[radius] = sprite
+        return sprite
+
+    def _enemy_blits(self, positions, radii):
+        if len(positions) == 0:
+            return []
+        sizes, which = np.unique(radii, return_inverse=True)
+        sprites = [self._sprite(float(r)) for r in sizes]
+        half = np.ceil(sizes).astype(int)[which]
+        corners = positions.astype(int) - half[:, None]
+        return list(zip(map(sprites.__getitem__, which.tolist()), corners.tolist()))
+
+    def draw(self, screen, sim, alpha=1.0):
+        # Returns the rects to pass to pygame.display.update, or None when
+        # the whole screen should be flipped.
+        px, py, angle, enemy_pos = sim.interpolated(alpha)
+        swarm = sim.swarm
+        radii = swarm.radius[: swarm.count]
+        full = self._full or not self.dirty_rects
+
+        if full:
+            screen.blit(self.background, (0, 0))
+        elif self._drawn:
+            screen.blits([(self.background, r, r) for r in self._drawn], doreturn=False)
+
+        drawn = screen.blits(self._enemy_blits(enemy_pos, radii), doreturn=self.dirty_rects) or []
+        drawn.append(sim.player.draw(screen, (px, py), angle))
+        beam = sim.railgun.draw(screen)
+        if beam is not None:
+            drawn.append(beam)
+
+        if full:
+            self._full = False
+            self._drawn = drawn
+            return None
+        dirty = self._drawn + drawn
+        self._drawn = drawn
+        return dirty
@@ -0,0 +1,299 @@
+import struct
+import zlib
+
+import numpy as np
+
+from systems.simulation import PlayerInput
+from systems.snapshot import capture, dumps, loads, to_simulation
+
+REPLAY_MAGIC = b"MSRP"
+REPLAY_VERSION = 1
+INDEX_MAGIC = b"MSRI"
+
+KEYFRAME_INTERVAL = 300
+POSITION_QUANTUM = 1.0 / 16.0
+ANGLE_SCALE = 32767 / np.pi
+
+DELTA_FRAME = 1
+KEY_FRAME = 2
+SNAPSHOT = 3
+INDEX = 4
+
+# magic, version, keyframe interval, position quantum
+_FILE_HEADER = struct.Struct("<4sHId")
+# kind, tick, payload length
+_CHUNK = struct.Struct("<BII")
+# enemies, removed slots, fired, dt, player x, y (quantized), angle (quantized),
+# move x, move y, aim x, aim y, fire, kills
+_FRAME = struct.Struct("<IHBdiihddddBI")
+# index offset, magic
+_FOOTER = struct.Struct("<Q4s")
+_INDEX_ENTRY = struct.Struct("<IQQ")
+
+
+class ReplayFrame:
+    __slots__ = (
+        "tick", "dt", "position", "velocity", "state", "player", "move", "aim", "fire", "kills", "shot", "removed",
+    )
+
+    def __init__(self, tick, dt, position, velocity, state, player, move, aim, fire, kills, shot, removed):
+        self.tick = tick
+        self.dt = dt
+        self.position = position
+        self.velocity = velocity
+        self.state = state
+        self.player = player
+        self.move = move
+        self.aim = aim
+        self.fire = fire
+        self.kills = kills
+        self.shot = shot
+        self.removed = removed
+
+    def control(self):
+        return PlayerInput(self.move, self.aim, self.fire)
+
+
+def _compact(arr, removed):
+    # Applies the step's slot removals in order, as EnemySwarm.remove does:
+    # the last slot moves into the one freed.
+    if not removed:
+        return arr
+    arr = arr.copy()
+    n = len(arr)
+    for i in removed:
+        n -= 1
+        arr[i] = arr[n]
+    return arr[:n]
+
+
+def _rebase(prev, removed, n):
+    # Previous frame's values aligned to this frame's slots; slots filled
+    # by spawns this tick have no previous value and delta against 0.
+    base = _compact(prev, removed)[:n]
+    if len(base) < n:
+        base = np.concatenate((base, np.zeros((n - len(base),) + prev.shape[1:], dtype=prev.dtype)))
+    return base
+
+
+class ReplayWriter:
+    # Streams one frame per tick to disk: player input, player pose, and
+    # every enemy's position, velocity and state quantized to integers.
+    # Frames are stored as deltas from the previous tick and zlib packed;
+    # every `keyframe_interval` ticks a full frame plus a world snapshot is
+    # written, and their offsets go to an index at the end of the file.
+    # Memory held is one frame plus one index entry per keyframe.
+    def __init__(self, path, sim, keyframe_interval=KEYFRAME_INTERVAL, quantum=POSITION_QUANTUM):
+        self.keyframe_interval = keyframe_interval
+        self.quantum = quantum
+        self.file = open(path, "wb")
+        self.file.write(_FILE_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, keyframe_interval, quantum))
+        self.index = []
+        self._prev = None
+        self._write_frame(sim, PlayerInput(), 0.0, key=True)
+
+    def _chunk(self, kind, tick, payload):
+        offset = self.file.tell()
+        self.file.write(_CHUNK.pack(kind, tick, len(payload)))
+        self.file.write(payload)
+        return offset
+
+    def _quantize(self, sim):
+        n = sim.swarm.count
+        q = self.quantum
+        pos = np.rint(sim.swarm.position[:n] / q).astype(np.int32)
+        vel = np.rint(sim.swarm.velocity[:n] / q).astype(np.int32)
+        return pos, vel, sim.swarm.state[:n].astype(np.int8)
+
+    def _write_frame(self, sim, control, dt, key):
+        pos, vel, state = self._quantize(sim)
+        removed = sim.removed
+        player = sim.player
+        head = _FRAME.pack(
+            len(pos),
+            len(removed),
+            bool(sim.shot),
+            dt,
+            int(round(player.position.x / self.quantum)),
+            int(round(player.position.y / self.quantum)),
+            int(round(((player.angle + np.pi) % (2 * np.pi) - np.pi) * ANGLE_SCALE)),
+            float(control.move[0]),
+            float(control.move[1]),
+            float(control.aim[0]),
+            float(control.aim[1]),
+            bool(control.fire),
+            sim.kills,
+        )
+        if key:
+            body = (pos, vel, state)
+        else:
+            p0, v0, s0 = self._prev
+            n = len(pos)
+            body = (pos - _rebase(p0, removed, n), vel - _rebase(v0, removed, n), state - _rebase(s0, removed, n))
+        payload = zlib.compress(
+            head + np.array(removed, dtype=np.uint32).tobytes() + b"".join(a.tobytes() for a in body), 1
+        )
+        self._prev = (pos, vel, state)
+
+        if key:
+            snap_at = self._chunk(SNAPSHOT, sim.ticks, dumps(capture(sim)))
+            frame_at = self._chunk(KEY_FRAME, sim.ticks, payload)
+            self.index.append((sim.ticks, frame_at, snap_at))
+        else:
+            self._chunk(DELTA_FRAME, sim.ticks, payload)
+
+    def record(self, sim, control, dt):
+        # Call once after every Simulation.step with the input it was given.
+        self._write_frame(sim, control, dt, key=sim.ticks % self.keyframe_interval == 0)
+
+    def close(self):
+        if self.file.closed:
+            return
+        entries = b"".join(_INDEX_ENTRY.pack(*entry) for entry in self.index)
+        at = self._chunk(INDEX, len(self.index), entries)
+        self.file.write(_FOOTER.pack(at, INDEX_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class ReplayReader:
+    # Random access over a recorded replay. Seeking jumps to the nearest
+    # keyframe at or before the target and decodes deltas from there, so
+    # no tick is ever re-simulated from the start. A file cut short (the
+    # game crashed) has no index and is scanned once instead.
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        magic, version, self.keyframe_interval, self.quantum = _FILE_HEADER.unpack(
+            self.file.read(_FILE_HEADER.size)
+        )
+        if magic != REPLAY_MAGIC:
+            raise ValueError("not a replay file")
+        if version != REPLAY_VERSION:
+            raise ValueError(f"unsupported replay version {version} (expected {REPLAY_VERSION})")
+        self.index = self._read_index()
+        if not self.index:
+            raise ValueError("replay has no keyframes")
+
+    def _read_index(self):
+        f = self.file
+        f.seek(0, 2)
+        end = f.tell()
+        if end >= _FILE_HEADER.size + _FOOTER.size:
+            f.seek(end - _FOOTER.size)
+            at, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic == INDEX_MAGIC:
+                f.seek(at)
+                kind, count, length = _CHUNK.unpack(f.read(_CHUNK.size))
+                data = f.read(length)
+                return [_INDEX_ENTRY.unpack_from(data, k * _INDEX_ENTRY.size) for k in range(count)]
+        return self._scan()
+
+    def _scan(self):
+        index = []
+        snap_at = None
+        for kind, tick, offset, _ in self._chunks(_FILE_HEADER.size):
+            if kind == SNAPSHOT:
+                snap_at = offset
+            elif kind == KEY_FRAME and snap_at is not None:
+                index.append((tick, offset, snap_at))
+        return index
+
+    def _chunks(self, offset):
+        # (kind, tick, offset, payload) from `offset` to the end or the index.
+        f = self.file
+        f.seek(offset)
+        while True:
+            head = f.read(_CHUNK.size)
+            if len(head) < _CHUNK.size:
+                return
+            kind, tick, length = _CHUNK.unpack(head)
+            payload = f.read(length)
+            if kind == INDEX or len(payload) < length:
+                return
+            yield kind, tick, offset, payload
+            offset += _CHUNK.size + length
+            f.seek(offset)
+
+    @property
+    def last_tick(self):
+        tick = self.index[-1][0]
+        for kind, t, _, _ in self._chunks(self.index[-1][1]):
+            tick = t
+        return tick
+
+    def _keyframe_for(self, tick):
+        ticks = [entry[0] for entry in self.index]
+        k = max(0, np.searchsorted(ticks, tick, side="right") - 1)
+        return self.index[k]
+
+    def _decode(self, kind, tick, payload, prev):
+        data = zlib.decompress(payload)
+        fields = _FRAME.unpack_from(data, 0)
+        n, n_removed, shot, dt, px, py, pa, mx, my, ax, ay, fire, kills = fields
+        at = _FRAME.size
+        removed = np.frombuffer(data, dtype=np.uint32, count=n_removed, offset=at).tolist()
+        at += 4 * n_removed
+        pos = np.frombuffer(data, dtype=np.int32, count=2 * n, offset=at).reshape(n, 2)
+        at += 8 * n
+        vel = np.frombuffer(data, dtype=np.int32, count=2 * n, offset=at).reshape(n, 2)
+        at += 8 * n
+        state = np.frombuffer(data, dtype=np.int8, count=n, offset=at)
+        if kind == DELTA_FRAME:
+            p0, v0, s0 = prev
+            pos = pos + _rebase(p0, removed, n)
+            vel = vel + _rebase(v0, removed, n)
+            state = state + _rebase(s0, removed, n)
+        q = self.quantum
+        frame = ReplayFrame(
+            tick, dt, pos * q, vel * q, state, (px * q, py * q, pa / ANGLE_SCALE),
+            (mx, my), (ax, ay), bool(fire), kills, bool(shot), removed,
+        )
+        return frame, (pos, vel, state)
+
+    def frames(self, start=0):
+        # Decoded frames from `start` to the end, each with the input that
+        # produced it. Only the deltas since the keyframe before `start` are
+        # decoded, and only the arrays of the latest frame are held.
+        _, frame_at, _ = self._keyframe_for(start)
+        prev = None
+        for kind, tick, _, payload in self._chunks(frame_at):
+            if kind == SNAPSHOT:
+                continue
+            frame, prev = self._decode(kind, tick, payload, prev)
+            if tick >= start:
+                yield frame
+
+    def frame(self, tick):
+        for frame in self.frames(tick):
+            return frame
+        raise IndexError(f"tick {tick} is past the end of the replay")
+
+    def simulation(self, tick):
+        # A live Simulation at `tick`: restored from the nearest snapshot and
+        # stepped forward with the recorded inputs.
+        tick0, frame_at, snap_at = self._keyframe_for(tick)
+        self.file.seek(snap_at)
+        _, _, length = _CHUNK.unpack(self.file.read(_CHUNK.size))
+        sim = to_simulation(loads(self.file.read(length)))
+        if tick > tick0:
+            for frame in self.frames(tick0 + 1):
+                sim.step(frame.dt, frame.control())
+                if frame.tick >= tick:
+                    break
+        return sim
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,241 @@
+from math import atan2, cos, pi, sin
+
+import numpy as np
+
+from core.rng import WorldRng
+from entities.obstacle import Obstacle
+from entities.player import Player
+from systems.ai_scheduler import AIScheduler
+from systems.ccd import ObstacleSweeper
+from systems.collision_stage import CollisionStage, Contacts
+from systems.collisions import sweep_player_obstacles
+from systems.clustering import ClusterTracker
+from systems.distance_field import DistanceField
+from systems.enemy_manager import spawn_enemies
+from systems.enemy_steering import visible_to_player
+from systems.enemy_swarm import EnemySwarm
+from systems.hide_spots import HideSpotTable
+from systems.navigation import FlowField
+from systems.profiler import NullProfiler
+from systems.railgun import Railgun
+from systems.raycast import RayBroadPhase
+from systems.timestep import lerp, lerp_angle
+from systems.visibility import ShadowMap
+from systems.waves import WaveSpawner
+
+WIDTH, HEIGHT = 1200, 800
+SHOT_COOLDOWN = 0.7
+# Autopilot handicaps: how far it turns per tick (radians), how far off
+# its aim lands, and how close to the target the aim must be to fire.
+AUTOPILOT_TURN = 0.1
+AUTOPILOT_SPREAD = 0.12
+AUTOPILOT_CONE = 0.08
+AUTOPILOT_FLEE_RANGE = 250
+# Ticks between switching which way the autopilot strafes.
+AUTOPILOT_STRAFE_TICKS = 90
+
+
+def default_obstacles():
+    return [
+        Obstacle(300, 300, 60),
+        Obstacle(800, 500, 80),
+        Obstacle(600, 200, 40),
+        Obstacle(950, 200, 25),
+    ]
+
+
+class PlayerInput:
+    __slots__ = ("move", "aim", "fire")
+
+    def __init__(self, move=(0, 0), aim=(0, 0), fire=False):
+        self.move = move
+        self.aim = aim
+        self.fire = fire
+
+
+class EpisodeResult:
+    __slots__ = ("seed", "outcome", "survival_time", "kills", "ticks")
+
+    def __init__(self, seed, outcome, survival_time, kills, ticks):
+        self.seed = seed
+        self.outcome = outcome
+        self.survival_time = survival_time
+        self.kills = kills
+        self.ticks = ticks
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Simulation:
+    # Owns the whole world and steps it without touching pygame. main.py
+    # drives it from the keyboard, headless runners from a policy.
+    def __init__(
+        self,
+        width=WIDTH,
+        height=HEIGHT,
+        enemy_count=14,
+        obstacles=None,
+        seed=None,
+        enemy_params=None,
+        endless=False,
+        railgun=None,
+    ):
+        self.seed = seed
+        self.rng = WorldRng(seed)
+        self.width = width
+        self.height = height
+        self.obstacles = default_obstacles() if obstacles is None else obstacles
+
+        self.player = Player(width // 2, height // 2)
+        self.swarm = EnemySwarm.from_enemies(
+            spawn_enemies(enemy_count, width, height, self.obstacles, rng=self.rng),
+            rng=self.rng,
+        )
+        self.enemies = self.swarm.enemies
+        for name, value in (enemy_params or {}).items():
+            self.swarm.set_param(name, value)
+        self.railgun = railgun if railgun is not None else Railgun()
+        self.clusters = ClusterTracker()
+        self.shadows = ShadowMap(self.obstacles)
+        self.hide_spots = HideSpotTable(self.obstacles)
+        self.sweeper = ObstacleSweeper(self.obstacles)
+        self.collisions = CollisionStage(self.sweeper)
+        self.contacts = Contacts()
+        self.field = DistanceField(self.obstacles, width, height)
+        self.nav = FlowField(self.obstacles, width, height)
+        self.scheduler = AIScheduler()
+        # Endless mode streams in waves and never ends in a win.
+        self.waves = WaveSpawner(width, height, self.obstacles, first_wave=max(enemy_count, 1)) if endless else None
+        self.ray_phase = RayBroadPhase(self.obstacles)
+        self.profiler = NullProfiler()
+
+        self.time = 0.0
+        self.ticks = 0
+        self.kills = 0
+        self.outcome = None
+        self.fire_was_down = False
+        # Slots removed during the last step, in removal order, and whether it fired.
+        self.removed = []
+        self.shot = False
+        self.prev_player = (self.player.position.x, self.player.position.y, self.player.angle)
+
+    @property
+    def done(self):
+        return self.outcome is not None
+
+    def step(self, dt, control):
+        player = self.player
+        enemies = self.enemies
+        obstacles = self.obstacles
+        prof = self.profiler
+
+        self.prev_player = (player.position.x, player.position.y, player.angle)
+        self.swarm.save_previous()
+        self.removed = []
+        self.shot = False
+
+        with prof.scope("player"):
+            player.update(dt, control.move, control.aim)
+            sweep_player_obstacles(player, self.prev_player[:2], self.sweeper)
+            self.railgun.update(dt)
+        with prof.scope("world_cache"):
+            self.shadows.rebuild(player.position)
+            self.hide_spots.rebuild(player.position)
+            self.nav.update(player.position)
+        with prof.scope("enemies"):
+            self.swarm.update(
+                dt, self.width, self.height, obstacles, player,
+                self.shadows, self.hide_spots, self.sweeper, self.field, self.nav,
+                scheduler=self.scheduler, resolve=False, pair_reach=self.clusters.cluster_radius,
+            )
+        with prof.scope("collisions"):
+            self.contacts = self.collisions.resolve(self.swarm, player, self.width, self.height)
+            if self.contacts.player_hit:
+                self.outcome = "loss"
+        with prof.scope("clusters"):
+            self.clusters.update(self.swarm, self.swarm.neighbor_pairs(self.clusters.cluster_radius))
+
+        if control.fire and not self.fire_was_down and player.can_shoot():
+            with prof.scope("railgun"):
+                n = self.swarm.count
+                self.ray_phase.set_targets(enemies, self.swarm.position[:n], self.swarm.radius[:n])
+                killed = self.railgun.fire(player, enemies, obstacles, self.ray_phase)
+                for e in killed:
+                    self.removed.append(e.index)
+                    self.swarm.remove(e)
+            self.kills += len(killed)
+            self.shot = True
+            player.trigger_shot_cooldown(SHOT_COOLDOWN)
+        self.fire_was_down = control.fire
+
+        if self.waves is not None:
+            with prof.scope("waves"):
+                self.waves.update(dt, self.swarm, player.position)
+
+        self.time += dt
+        self.ticks += 1
+        if self.outcome is None and len(enemies) == 0 and self.waves is None:
+            self.outcome = "win"
+        return self.outcome
+
+    def interpolated(self, alpha):
+        # World as drawn `alpha` of the way from the previous tick to the
+        # current one: (player x, player y, player angle, enemy positions).
+        player = self.player
+        px, py, angle = self.prev_player
+        n = self.swarm.count
+        prev = self.swarm.prev_position[:n]
+        return (
+            lerp(px, player.position.x, alpha),
+            lerp(py, player.position.y, alpha),
+            lerp_angle(angle, player.angle, alpha),
+            prev + (self.swarm.position[:n] - prev) * alpha,
+        )
+
+    def run(self, policy, dt=1.0 / 60.0, max_time=120.0):
+        while self.outcome is None and self.time < max_time:
+            self.step(dt, policy(self))
+        return EpisodeResult(self.seed, self.outcome or "timeout", self.time, self.kills, self.ticks)
+
+
+def autopilot(sim):
+    # Scripted player for headless runs. It turns towards the nearest
+    # visible enemy at a limited rate, with a seeded aim error, and fires
+    # only once the aim is inside a small cone around the target. It backs
+    # away from enemies that get close and otherwise strafes around the
+    # nearest one. It is still biased towards winning: it reads every
+    # enemy's exact position and reacts on the same tick, so compare farm
+    # outcomes between AI parameter sets rather than reading them as
+    # absolute difficulty.
+    player = sim.player
+    enemies = sim.enemies
+    px, py = player.position.x, player.position.y
+    if not enemies:
+        return PlayerInput(aim=(px + cos(player.angle), py + sin(player.angle)))
+
+    pos = sim.swarm.position[: sim.swarm.count]
+    d_sq = (pos[:, 0] - px) ** 2 + (pos[:, 1] - py) ** 2
+    nearest = int(np.argmin(d_sq))
+    nx, ny = pos[nearest]
+
+    target = None
+    for i in np.argsort(d_sq)[:8]:
+        if visible_to_player(enemies[i], player, sim.obstacles):
+            target = int(i)
+            break
+
+    if d_sq[nearest] < AUTOPILOT_FLEE_RANGE * AUTOPILOT_FLEE_RANGE:
+        move = (px - nx, py - ny)
+    else:
+        side = 1 if (sim.ticks // AUTOPILOT_STRAFE_TICKS) % 2 else -1
+        move = (-(ny - py) * side, (nx - px) * side)
+
+    tx, ty = pos[nearest if target is None else target]
+    wanted = atan2(ty - py, tx - px)
+    error = (wanted - player.angle + pi) % (2 * pi) - pi
+    angle = player.angle + max(-AUTOPILOT_TURN, min(AUTOPILOT_TURN, error))
+    angle += sim.rng.uniform(-AUTOPILOT_SPREAD, AUTOPILOT_SPREAD)
+    aim = (px + cos(angle) * 100, py + sin(angle) * 100)
+    fire = target is not None and abs(error) <= AUTOPILOT_CONE and not sim.fire_was_down
+    return PlayerInput(move=move, aim=aim, fire=fire)
@@ -0,0 +1,246 @@
+import copy
+import json
+import struct
+
+import numpy as np
+
+from core.rng import WorldRng
+from core.vector2 import Vector2
+from entities.obstacle import Obstacle
+from entities.player import Player
+from systems.ccd import ObstacleSweeper
+from systems.enemy_swarm import EnemySwarm
+from systems.hide_spots import HideSpotTable
+from systems.railgun import PiercingRailgun, Railgun
+from systems.raycast import CircleGrid
+from systems.visibility import ShadowMap
+
+SNAPSHOT_MAGIC = b"MSWS"
+SNAPSHOT_VERSION = 1
+
+# magic, version, length of the JSON meta block
+_HEADER = struct.Struct("<4sHI")
+_COUNT = struct.Struct("<H")
+_U8 = struct.Struct("<B")
+_DIM = struct.Struct("<I")
+
+_WAVE_FIELDS = ("first_wave", "growth", "interval", "safe_radius", "max_alive", "wave", "timer", "spawned")
+
+
+class WorldSnapshot:
+    # Everything that changes while a match runs. Per-enemy state is kept
+    # as the swarm's own flat arrays; the few scalars (player, railgun,
+    # clocks, counters, RNG state) live in a small meta dict. Map-derived
+    # caches are not stored: they are rebuilt from the obstacles.
+    __slots__ = ("meta", "arrays")
+
+    def __init__(self, meta, arrays):
+        self.meta = meta
+        self.arrays = arrays
+
+
+def _vec(v):
+    return None if v is None else [v.x, v.y]
+
+
+def _unvec(v):
+    return None if v is None else Vector2(v[0], v[1])
+
+
+def capture(sim):
+    player = sim.player
+    railgun = sim.railgun
+    seq = sim.rng.seed_sequence
+    meta = {
+        "width": sim.width,
+        "height": sim.height,
+        "seed": sim.seed,
+        "rng_entropy": seq.entropy,
+        "rng_spawn_key": list(seq.spawn_key),
+        "rng_state": copy.deepcopy(sim.rng.get_state()),
+        "time": sim.time,
+        "ticks": sim.ticks,
+        "kills": sim.kills,
+        "outcome": sim.outcome,
+        "fire_was_down": sim.fire_was_down,
+        "prev_player": list(sim.prev_player),
+        "cluster_next_id": sim.clusters.next_id,
+        "scheduler_tick": sim.scheduler.tick,
+        "enemy_params": dict(sim.swarm.params),
+        "waves": None if sim.waves is None else {name: getattr(sim.waves, name) for name in _WAVE_FIELDS},
+        "player": {
+            "x": player.position.x,
+            "y": player.position.y,
+            "radius": player.collider.radius,
+            "speed": player.speed,
+            "angle": player.angle,
+            "shoot_cooldown": player.shoot_cooldown,
+            "beam_length": player.beam_length,
+        },
+        "railgun": {
+            "beam_length": railgun.beam_length,
+            "color": list(railgun.color),
+            "thickness": railgun.thickness,
+            "beam_time": railgun.beam_time,
+            "beam_timer": railgun.beam_timer,
+            "last_beam_start": _vec(railgun.last_beam_start),
+            "last_beam_end": _vec(railgun.last_beam_end),
+        },
+    }
+    if isinstance(railgun, PiercingRailgun):
+        meta["railgun"]["pierce"] = railgun.pierce
+        meta["railgun"]["bounces"] = railgun.bounces
+        meta["railgun"]["last_beam_path"] = [_vec(p) for p in railgun.last_beam_path]
+    arrays = sim.swarm.export_arrays()
+    arrays["obstacles"] = np.array(
+        [(ob.collider.position.x, ob.collider.position.y, ob.collider.radius) for ob in sim.obstacles],
+        dtype=float,
+    ).reshape(-1, 3)
+    return WorldSnapshot(meta, arrays)
+
+
+def restore(sim, snap):
+    # Puts `snap` into `sim`, which must be on the same map. Player, railgun,
+    # swarm and RNG are replaced with fresh objects rather than edited, so a
+    # clone never writes into the world it was forked from.
+    meta = snap.meta
+    sim.width = meta["width"]
+    sim.height = meta["height"]
+    sim.seed = meta["seed"]
+
+    rng = WorldRng(np.random.SeedSequence(meta["rng_entropy"], spawn_key=tuple(meta["rng_spawn_key"])))
+    rng.set_state(copy.deepcopy(meta["rng_state"]))
+    sim.rng = rng
+
+    swarm_arrays = {name: arr for name, arr in snap.arrays.items() if name != "obstacles"}
+    sim.swarm = EnemySwarm.from_arrays(swarm_arrays, rng=rng)
+    sim.swarm.params = dict(meta.get("enemy_params", {}))
+    sim.enemies = sim.swarm.enemies
+
+    p = meta["player"]
+    player = Player(p["x"], p["y"], p["radius"], p["speed"])
+    player.angle = p["angle"]
+    player.shoot_cooldown = p["shoot_cooldown"]
+    player.beam_length = p["beam_length"]
+    sim.player = player
+
+    r = meta["railgun"]
+    if "pierce" in r:
+        railgun = PiercingRailgun(r["beam_length"], tuple(r["color"]), r["thickness"], r["pierce"], r["bounces"])
+        railgun.last_beam_path = [_unvec(p) for p in r["last_beam_path"]]
+    else:
+        railgun = Railgun(r["beam_length"], tuple(r["color"]), r["thickness"])
+    railgun.beam_time = r["beam_time"]
+    railgun.beam_timer = r["beam_timer"]
+    railgun.last_beam_start = _unvec(r["last_beam_start"])
+    railgun.last_beam_end = _unvec(r["last_beam_end"])
+    sim.railgun = railgun
+
+    sim.time = meta["time"]
+    sim.ticks = meta["ticks"]
+    sim.kills = meta["kills"]
+    sim.outcome = meta["outcome"]
+    sim.fire_was_down = meta["fire_was_down"]
+    sim.prev_player = tuple(meta["prev_player"])
+    sim.clusters.next_id = meta["cluster_next_id"]
+    sim.scheduler.tick = meta["scheduler_tick"]
+    waves = meta.get("waves")
+    if waves is not None:
+        for name in _WAVE_FIELDS:
+            setattr(sim.waves, name, waves[name])
+
+    # Per-player-position caches must not serve the old position.
+    sim.hide_spots.player_key = None
+    sim.nav.target_cell = None
+    return sim
+
+
+def clone(sim):
+    # Independent copy of a running world. Read-only map data (obstacles,
+    # distance field, nav blocked mask, obstacle ray grid) is shared; the
+    # per-tick caches get their own cheap instances.
+    snap = capture(sim)
+    fork = copy.copy(sim)
+    fork.clusters = copy.copy(sim.clusters)
+    fork.scheduler = copy.copy(sim.scheduler)
+    fork.nav = copy.copy(sim.nav)
+    fork.waves = copy.copy(sim.waves)
+    fork.shadows = ShadowMap(sim.obstacles)
+    fork.hide_spots = HideSpotTable(sim.obstacles)
+    fork.sweeper = ObstacleSweeper(sim.obstacles)
+    fork.collisions = copy.copy(sim.collisions)
+    fork.collisions.sweeper = fork.sweeper
+    fork.ray_phase = copy.copy(sim.ray_phase)
+    fork.ray_phase.target_grid = CircleGrid(sim.ray_phase.cell_size)
+    fork.ray_phase.targets = []
+    return restore(fork, snap)
+
+
+def to_simulation(snap):
+    from systems.simulation import Simulation
+
+    meta = snap.meta
+    obstacles = [Obstacle(float(x), float(y), float(r)) for x, y, r in snap.arrays["obstacles"]]
+    sim = Simulation(
+        meta["width"],
+        meta["height"],
+        enemy_count=0,
+        obstacles=obstacles,
+        seed=meta["seed"],
+        endless=meta.get("waves") is not None,
+    )
+    return restore(sim, snap)
+
+
+def dumps(snap):
+    meta = json.dumps(snap.meta, separators=(",", ":")).encode()
+    parts = [_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(meta)), meta, _COUNT.pack(len(snap.arrays))]
+    for name, arr in snap.arrays.items():
+        arr = np.ascontiguousarray(arr)
+        key = name.encode()
+        dtype = arr.dtype.str.encode()
+        parts += [_U8.pack(len(key)), key, _U8.pack(len(dtype)), dtype, _U8.pack(arr.ndim)]
+        parts += [_DIM.pack(d) for d in arr.shape]
+        parts.append(arr.tobytes())
+    return b"".join(parts)
+
+
+def loads(data):
+    view = memoryview(data)
+    magic, version, meta_len = _HEADER.unpack_from(view, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not a world snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {version} (expected {SNAPSHOT_VERSION})")
+    at = _HEADER.size
+    meta = json.loads(bytes(view[at : at + meta_len]))
+    at += meta_len
+    (count,) = _COUNT.unpack_from(view, at)
+    at += _COUNT.size
+
+    arrays = {}
+    for _ in range(count):
+        (n,) = _U8.unpack_from(view, at)
+        name = bytes(view[at + 1 : at + 1 + n]).decode()
+        at += 1 + n
+        (n,) = _U8.unpack_from(view, at)
+        dtype = np.dtype(bytes(view[at + 1 : at + 1 + n]).decode())
+        at += 1 + n
+        (ndim,) = _U8.unpack_from(view, at)
+        at += 1
+        shape = tuple(_DIM.unpack_from(view, at + k * _DIM.size)[0] for k in range(ndim))
+        at += ndim * _DIM.size
+        size = int(np.prod(shape)) * dtype.itemsize
+        arrays[name] = np.frombuffer(view[at : at + size], dtype=dtype).reshape(shape)
+        at += size
+    return WorldSnapshot(meta, arrays)
+
+
+def save(sim, path):
+    with open(path, "wb") as f:
+        f.write(dumps(capture(sim)))
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return to_simulation(loads(f.read()))
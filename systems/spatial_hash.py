@@ -0,0 +1,119 @@
+from math import floor
+
+import numpy as np
+
+NEIGHBOR_CELL_SIZE = 230
+# Up to this many points a dense distance test beats bucketing them.
+DENSE_PAIRS_MAX = 64
+
+
+class SpatialHash:
+    # max_radius is the largest collider radius inserted since the last
+    # clear, so pair tests can widen their query by it.
+    def __init__(self, cell_size=NEIGHBOR_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.max_radius = 0.0
+
+    def _cell(self, x, y):
+        s = self.cell_size
+        return floor(x / s), floor(y / s)
+
+    def clear(self):
+        self.cells.clear()
+        self.max_radius = 0.0
+
+    def insert(self, item, x, y, radius=0.0):
+        if radius > self.max_radius:
+            self.max_radius = radius
+        key = self._cell(x, y)
+        bucket = self.cells.get(key)
+        if bucket is None:
+            self.cells[key] = [item]
+        else:
+            bucket.append(item)
+
+    def rebuild(self, entities):
+        self.clear()
+        for e in entities:
+            p = e.position
+            self.insert(e, p.x, p.y, e.collider.radius)
+        return self
+
+    def query(self, x, y, radius):
+        # Candidates from every cell touched by the query box; callers keep
+        # their exact distance tests.
+        s = self.cell_size
+        cx0, cy0 = floor((x - radius) / s), floor((y - radius) / s)
+        cx1, cy1 = floor((x + radius) / s), floor((y + radius) / s)
+        cells = self.cells
+        out = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    out.extend(bucket)
+        return out
+
+
+def _dense_pairs(positions, radius, rows=None):
+    query = np.arange(len(positions)) if rows is None else np.asarray(rows, dtype=np.intp)
+    d = positions[query, None, :] - positions[None, :, :]
+    close = d[:, :, 0] * d[:, :, 0] + d[:, :, 1] * d[:, :, 1] <= radius * radius
+    close[np.arange(len(query)), query] = False
+    a, j = np.nonzero(close)
+    return query[a], j
+
+
+def grid_pairs(positions, radius, rows=None, dense_max=DENSE_PAIRS_MAX):
+    # All ordered pairs (i, j), i != j, closer than radius. Points are sorted
+    # into square cells of side radius, so only the 3x3 block around each
+    # point is examined; up to dense_max points every pair is tested
+    # directly instead. With `rows`, only pairs whose i is in rows are
+    # produced (j still ranges over every point).
+    n = len(positions)
+    empty = np.zeros(0, dtype=np.intp)
+    if n < 2:
+        return empty, empty
+    if n <= dense_max:
+        return _dense_pairs(positions, radius, rows)
+
+    cells = np.floor(positions / radius).astype(np.int64)
+    cells -= cells.min(axis=0)
+    stride = int(cells[:, 1].max()) + 3
+    keys = (cells[:, 0] + 1) * stride + (cells[:, 1] + 1)
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    unique_keys, starts, counts = np.unique(sorted_keys, return_index=True, return_counts=True)
+
+    query = np.arange(n) if rows is None else np.asarray(rows, dtype=np.intp)
+    query_keys = keys[query]
+
+    first = []
+    second = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            probe = query_keys + dx * stride + dy
+            slot = np.searchsorted(unique_keys, probe)
+            slot = np.minimum(slot, len(unique_keys) - 1)
+            found = unique_keys[slot] == probe
+            src = np.flatnonzero(found)
+            num = counts[slot[src]]
+            total = int(num.sum())
+            if total == 0:
+                continue
+            i = np.repeat(query[src], num)
+            run_start = np.repeat(np.cumsum(num) - num, num)
+            offset = np.arange(total) - run_start
+            j = order[np.repeat(starts[slot[src]], num) + offset]
+            first.append(i)
+            second.append(j)
+
+    if not first:
+        return empty, empty
+    i = np.concatenate(first)
+    j = np.concatenate(second)
+    d = positions[i] - positions[j]
+    keep = (i != j) & (d[:, 0] * d[:, 0] + d[:, 1] * d[:, 1] <= radius * radius)
+    return i[keep], j[keep]
@@ -0,0 +1,191 @@
+from math import pi, sqrt
+
+import numpy as np
+
+from systems.raycast import CircleGrid
+
+SPAWN_ATTEMPTS = 30
+# Share of the free area a saturated Bridson sampling leaves between points
+# (about 0.6 / spacing**2 points per unit area), and how many extra points
+# to aim for so the final pick is still a random subset.
+BRIDSON_DENSITY = 0.6
+SPAWN_SLACK = 1.3
+SPACING_SHRINK = 0.85
+# Active points expanded per round of the sampler, and candidates each
+# of them tries per round.
+SPAWN_BATCH = 256
+SPAWN_TRIES = 4
+
+# Cell offsets that can hold a point closer than `spacing` when cells are
+# spacing / sqrt(2) wide.
+_NEAR = np.array([(di, dj) for di in range(-2, 3) for dj in range(-2, 3) if abs(di) + abs(dj) < 4])
+
+
+class SpawnShortfall(ValueError):
+    # Raised when the free space can't hold the requested count without
+    # overlaps. `placed` holds what did fit, so a caller can still use it.
+    def __init__(self, requested, placed):
+        super().__init__(f"only room for {len(placed)} of {requested} enemies")
+        self.requested = requested
+        self.placed = placed
+
+
+class FreeSpace:
+    # Where an enemy of `radius` can stand: inside the arena, outside the
+    # obstacles, the keep-out discs and the occupied discs. Tests a batch of
+    # points at once against obstacles bucketed in a CircleGrid, grown by
+    # `radius`; occupied discs (enemies already standing) get a grid too.
+    def __init__(self, width, height, obstacles, radius, keep_out=()):
+        self.width = width
+        self.height = height
+        self.radius = radius
+        self.keep_out = [(float(x), float(y), float(r)) for x, y, r in keep_out]
+        cx = np.array([ob.collider.position.x for ob in obstacles], dtype=float)
+        cy = np.array([ob.collider.position.y for ob in obstacles], dtype=float)
+        r = np.array([ob.collider.radius for ob in obstacles], dtype=float) + radius
+        cell = max(2.0 * radius, float(np.median(r)) if len(r) else 0.0)
+        self.grid = CircleGrid(cell).build(cx, cy, r)
+        self.occupied = CircleGrid(2.0 * radius)
+
+    def occupy(self, position, radius):
+        # Discs of `radius` (scalar or per point) a new point must keep
+        # clear of, replacing the previous set.
+        self.occupied.build(position[:, 0].copy(), position[:, 1].copy(), np.asarray(radius) + self.radius)
+        return self
+
+    @property
+    def area(self):
+        # Rough: overlaps between obstacles and discs are ignored, and an
+        # occupied disc only takes its own enemy's footprint.
+        r = self.radius
+        area = max(self.width - 2 * r, 0) * max(self.height - 2 * r, 0)
+        area -= sum(pi * rr * rr for rr in self.grid.r)
+        area -= sum(pi * rr * rr for _, _, rr in self.keep_out)
+        area -= pi * float(((self.occupied.r - r) ** 2).sum())
+        return max(area, 0.0)
+
+    def contains(self, x, y):
+        r = self.radius
+        ok = (x >= r) & (x <= self.width - r) & (y >= r) & (y <= self.height - r)
+        for kx, ky, kr in self.keep_out:
+            ok &= (x - kx) ** 2 + (y - ky) ** 2 >= kr * kr
+        for g in (self.grid, self.occupied):
+            if len(g):
+                pt, ob = g.point_items(x, y)
+                hit = (x[pt] - g.cx[ob]) ** 2 + (y[pt] - g.cy[ob]) ** 2 < g.r[ob] ** 2
+                ok[pt[hit]] = False
+        return ok
+
+
+def poisson_disk(space, spacing, rng, attempts=SPAWN_ATTEMPTS, batch=SPAWN_BATCH):
+    # Bridson's sampler over `space`: no two points closer than `spacing`,
+    # and no room left for another. A background grid of spacing / sqrt(2)
+    # cells holds at most one point each, so a neighbour test reads a fixed
+    # 5x5 block. Each round, up to `batch` active points each try a few
+    # candidates in the annulus [spacing, 2 * spacing] around them, all in
+    # one pass; every active point keeps its first candidate that fits and
+    # retires once `attempts` candidates in total have failed. Kept
+    # candidates that crowd an earlier one from the same round are dropped,
+    # and their active point simply tries again. When the front dies out
+    # (obstacles can cut the arena into pockets), random points reseed it.
+    cell = spacing / sqrt(2.0)
+    nx = int(np.ceil(space.width / cell))
+    ny = int(np.ceil(space.height / cell))
+    # Two cells of padding so the 5x5 block never needs clipping. Empty
+    # cells point at a sentinel slot parked at infinity, so the neighbour
+    # test needs no mask.
+    empty = nx * ny
+    grid = np.full((nx + 4, ny + 4), empty, dtype=np.intp)
+    px = np.full(empty + 1, np.inf)
+    py = np.full(empty + 1, np.inf)
+    count = 0
+    spacing_sq = spacing * spacing
+    gen = rng.generator
+
+    def fits(xs, ys):
+        # Cheapest tests first, each on the survivors of the last: the
+        # candidate's own cell, then the 5x5 block, then the free space.
+        i = np.clip(xs // cell, 0, nx - 1).astype(np.intp) + 2
+        j = np.clip(ys // cell, 0, ny - 1).astype(np.intp) + 2
+        ok = np.zeros(len(xs), dtype=bool)
+        idx = np.flatnonzero(grid[i, j] == empty)
+        near = grid[i[idx, None] + _NEAR[:, 0], j[idx, None] + _NEAR[:, 1]]
+        d_sq = (px[near] - xs[idx, None]) ** 2 + (py[near] - ys[idx, None]) ** 2
+        idx = idx[d_sq.min(axis=1) >= spacing_sq]
+        ok[idx[space.contains(xs[idx], ys[idx])]] = True
+        return ok
+
+    def place(xy):
+        nonlocal count
+        new = np.arange(count, count + len(xy))
+        px[new] = xy[:, 0]
+        py[new] = xy[:, 1]
+        grid[(xy[:, 0] // cell).astype(np.intp) + 2, (xy[:, 1] // cell).astype(np.intp) + 2] = new
+        count += len(xy)
+        return new
+
+    # A point tries `tries` candidates a round and retires once it has
+    # failed `attempts` times in total.
+    tries = min(attempts, SPAWN_TRIES)
+    active = np.zeros(0, dtype=np.intp)
+    failed = np.zeros(0, dtype=np.intp)
+    while True:
+        if not len(active):
+            xs = gen.uniform(0.0, space.width, attempts)
+            ys = gen.uniform(0.0, space.height, attempts)
+            good = np.flatnonzero(fits(xs, ys))
+            if not len(good):
+                break
+            active = place(np.array([[xs[good[0]], ys[good[0]]]]))
+            failed = np.zeros(1, dtype=np.intp)
+            continue
+
+        if len(active) > batch:
+            pick = np.unique(gen.integers(len(active), size=batch))
+        else:
+            pick = np.arange(len(active))
+        m = len(pick)
+        origin = active[pick]
+        angle = gen.uniform(0.0, 2 * pi, (m, tries))
+        dist = spacing * np.sqrt(gen.uniform(1.0, 4.0, (m, tries)))
+        xs = px[origin, None] + dist * np.cos(angle)
+        ys = py[origin, None] + dist * np.sin(angle)
+        good = fits(xs.ravel(), ys.ravel()).reshape(m, tries)
+
+        found = good.any(axis=1)
+        first = np.argmax(good, axis=1)
+        rows = np.flatnonzero(found)
+        chosen = np.column_stack((xs[rows, first[rows]], ys[rows, first[rows]]))
+        if len(chosen) > 1:
+            d_sq = ((chosen[:, None, :] - chosen[None, :, :]) ** 2).sum(axis=2)
+            crowded = np.triu(d_sq < spacing_sq, k=1).any(axis=0)
+            chosen = chosen[~crowded]
+
+        failed[pick[~found]] += tries
+        keep = failed < attempts
+        added = place(chosen)
+        active = np.concatenate((active[keep], added))
+        failed = np.concatenate((failed[keep], np.zeros(len(added), dtype=np.intp)))
+
+    return np.column_stack((px[:count], py[:count]))
+
+
+def spawn_points(num, space, rng, min_spacing, attempts=SPAWN_ATTEMPTS):
+    # `num` points spread over `space`, at least `min_spacing` apart. The
+    # spacing starts as wide as the free area allows for about num * slack
+    # points and shrinks toward `min_spacing` until enough fit; a random
+    # subset of the saturated sampling is kept, in generation order (which
+    # is spatially coherent). Returns fewer than `num` only when even
+    # `min_spacing` can't fit them all.
+    if num <= 0:
+        return np.empty((0, 2))
+    spacing = max(min_spacing, sqrt(BRIDSON_DENSITY * space.area / (num * SPAWN_SLACK)))
+    while True:
+        points = poisson_disk(space, spacing, rng, attempts)
+        if len(points) >= num or spacing <= min_spacing:
+            break
+        spacing = max(min_spacing, spacing * SPACING_SHRINK)
+    if len(points) > num:
+        keep = np.sort(rng.generator.choice(len(points), num, replace=False))
+        points = points[keep]
+    return points
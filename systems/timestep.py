@@ -0,0 +1,43 @@
+from math import atan2, cos, sin
+
+TICK_RATE = 60
+MAX_CATCH_UP_STEPS = 5
+
+
+class FixedTimestep:
+    # Accumulates wall-clock frame time and hands out whole simulation ticks
+    # of exactly `dt`. After a long stall at most `max_steps` ticks are run
+    # and the rest of the backlog is dropped, so one spike can't snowball
+    # into a spiral of ever longer frames. `alpha` is how far the renderer
+    # is between the last two ticks.
+    def __init__(self, tick_rate=TICK_RATE, max_steps=MAX_CATCH_UP_STEPS):
+        self.tick_rate = tick_rate
+        self.dt = 1.0 / tick_rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped = 0.0
+
+    def advance(self, frame_dt):
+        self.accumulator += frame_dt
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            self.dropped += (steps - self.max_steps) * self.dt
+            steps = self.max_steps
+            self.accumulator = self.accumulator % self.dt
+        else:
+            self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.dt)
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+
+def lerp_angle(a, b, t):
+    # Along the shorter arc, so a turn across +-pi doesn't spin the long way.
+    delta = atan2(sin(b - a), cos(b - a))
+    return a + delta * t
@@ -0,0 +1,167 @@
+from bisect import bisect_right
+from math import asin, atan2, cos, hypot, pi, sin, sqrt
+
+import numpy as np
+
+TWO_PI = 2 * pi
+# Up to this many point x interval tests, visible_mask() does them all at once.
+DENSE_MASK_MAX = 4096
+
+
+class ShadowMap:
+    # Angular shadows cast by the static obstacles as seen from one point.
+    # rebuild() runs once per tick for the player's position, and returns
+    # straight away if the player hasn't moved. After that, visibility
+    # costs one atan2, a bisect into the sorted interval bounds and a
+    # distance check against the few obstacles covering that angle.
+    def __init__(self, obstacles):
+        self.obstacles = obstacles
+        self.cx = np.array([ob.collider.position.x for ob in obstacles], dtype=float)
+        self.cy = np.array([ob.collider.position.y for ob in obstacles], dtype=float)
+        self.radius = np.array([ob.collider.radius for ob in obstacles], dtype=float)
+        self._circles = list(zip(self.cx.tolist(), self.cy.tolist(), self.radius.tolist()))
+
+        self.origin = None
+        self.inside = False
+        self.bounds = []
+        self.covering = []
+        self.intervals = []
+        self._center_angle = []
+        self._center_dist = []
+
+    def rebuild(self, origin):
+        ox, oy = origin.x, origin.y
+        if (ox, oy) == self.origin:
+            return self
+        self.origin = (ox, oy)
+        self.inside = False
+        self._center_angle = []
+        self._center_dist = []
+
+        intervals = []
+        for k, (cx, cy, r) in enumerate(self._circles):
+            dx = cx - ox
+            dy = cy - oy
+            d = hypot(dx, dy)
+            self._center_angle.append(atan2(dy, dx))
+            self._center_dist.append(d)
+            if d <= r:
+                self.inside = True
+                continue
+            theta = self._center_angle[k]
+            half = asin(r / d)
+            lo, hi = theta - half, theta + half
+            if lo < -pi:
+                intervals.append((lo + TWO_PI, pi, k))
+                intervals.append((-pi, hi, k))
+            elif hi > pi:
+                intervals.append((lo, pi, k))
+                intervals.append((-pi, hi - TWO_PI, k))
+            else:
+                intervals.append((lo, hi, k))
+        intervals.sort()
+        self.intervals = intervals
+        # The same intervals as arrays, for visible_mask().
+        k = np.array([k for _, _, k in intervals], dtype=np.intp)
+        self._lo = np.array([lo for lo, _, _ in intervals], dtype=float)
+        self._hi = np.array([hi for _, hi, _ in intervals], dtype=float)
+        self._interval_dist = np.array(self._center_dist, dtype=float)[k]
+        self._interval_angle = np.array(self._center_angle, dtype=float)[k]
+        self._interval_radius = self.radius[k]
+
+        # Split the circle at every interval end with one sweep; each
+        # elementary arc keeps the obstacles that cover it.
+        events = sorted([(lo, 1, k) for lo, _, k in intervals] + [(hi, 0, k) for _, hi, k in intervals])
+        bounds = []
+        covering = []
+        active = set()
+        i = 0
+        while i < len(events):
+            angle = events[i][0]
+            while i < len(events) and events[i][0] == angle:
+                _, is_start, k = events[i]
+                if is_start:
+                    active.add(k)
+                else:
+                    active.discard(k)
+                i += 1
+            bounds.append(angle)
+            covering.append(tuple(active))
+        self.bounds = bounds
+        self.covering = covering[:-1]
+        return self
+
+    def _entry_distance(self, k, angle):
+        # Distance from the origin to where a ray at `angle` enters obstacle k.
+        d = self._center_dist[k]
+        r = self.radius[k]
+        phi = angle - self._center_angle[k]
+        along = d * cos(phi)
+        across = d * sin(phi)
+        return along - sqrt(max(0.0, r * r - across * across))
+
+    def blocked(self, x, y):
+        if self.inside:
+            return True
+        bounds = self.bounds
+        if not bounds:
+            return False
+        ox, oy = self.origin
+        dx = x - ox
+        dy = y - oy
+        angle = atan2(dy, dx)
+        i = bisect_right(bounds, angle) - 1
+        if i < 0 or i >= len(self.covering):
+            return False
+        candidates = self.covering[i]
+        if not candidates:
+            return False
+        dist = hypot(dx, dy)
+        for k in candidates:
+            if dist >= self._entry_distance(k, angle):
+                return True
+        return False
+
+    def visible(self, position):
+        return not self.blocked(position.x, position.y)
+
+    def visible_mask(self, positions):
+        n = len(positions)
+        if self.inside:
+            return np.zeros(n, dtype=bool)
+        if not self.intervals or n == 0:
+            return np.ones(n, dtype=bool)
+
+        ox, oy = self.origin
+        dx = positions[:, 0] - ox
+        dy = positions[:, 1] - oy
+        angle = np.arctan2(dy, dx)
+        dist = np.hypot(dx, dy)
+
+        if n * len(self.intervals) <= DENSE_MASK_MAX:
+            # Every point against every interval in one pass.
+            a = angle[:, None]
+            d = self._interval_dist
+            r = self._interval_radius
+            phi = a - self._interval_angle
+            across = d * np.sin(phi)
+            entry = d * np.cos(phi) - np.sqrt(np.maximum(0.0, r * r - across * across))
+            within = (a >= self._lo) & (a <= self._hi)
+            return ~(within & (dist[:, None] >= entry)).any(axis=1)
+
+        order = np.argsort(angle)
+        sorted_angle = angle[order]
+        blocked = np.zeros(n, dtype=bool)
+        for lo, hi, k in self.intervals:
+            a = np.searchsorted(sorted_angle, lo, side="left")
+            b = np.searchsorted(sorted_angle, hi, side="right")
+            if a == b:
+                continue
+            idx = order[a:b]
+            d = self._center_dist[k]
+            r = self.radius[k]
+            phi = angle[idx] - self._center_angle[k]
+            across = d * np.sin(phi)
+            entry = d * np.cos(phi) - np.sqrt(np.maximum(0.0, r * r - across * across))
+            blocked[idx] |= dist[idx] >= entry
+        return ~blocked
@@ -0,0 +1,61 @@
+from systems.spawner import FreeSpace, spawn_points
+
+WAVE_SIZE = 14
+WAVE_GROWTH = 1.25
+WAVE_INTERVAL = 20.0
+WAVE_SAFE_RADIUS = 300
+MAX_ALIVE = 4000
+
+
+class WaveSpawner:
+    # Endless survival: a new wave streams in every `interval` seconds, or
+    # as soon as the arena is cleared, each `growth` times bigger than the
+    # last and capped so no more than `max_alive` enemies are up at once.
+    # Waves are Poisson-disk spawned over free space, away from where the
+    # player stands now and clear of enemies already up, straight into the
+    # swarm's free slots.
+    def __init__(
+        self,
+        width,
+        height,
+        obstacles,
+        first_wave=WAVE_SIZE,
+        growth=WAVE_GROWTH,
+        interval=WAVE_INTERVAL,
+        safe_radius=WAVE_SAFE_RADIUS,
+        max_alive=MAX_ALIVE,
+        enemy_radius=12,
+    ):
+        self.first_wave = first_wave
+        self.growth = growth
+        self.interval = interval
+        self.safe_radius = safe_radius
+        self.max_alive = max_alive
+        self.enemy_radius = enemy_radius
+        self.space = FreeSpace(width, height, obstacles, enemy_radius)
+        # The opening enemies count as wave 0.
+        self.wave = 1
+        self.timer = interval
+        self.spawned = 0
+
+    def wave_size(self, wave):
+        return int(round(self.first_wave * self.growth ** wave))
+
+    def update(self, dt, swarm, player_pos):
+        # Spawns the next wave when it is due; returns the new enemies. A
+        # wave due while the swarm is at its cap waits for kills to make
+        # room instead of being skipped.
+        self.timer -= dt
+        if self.timer > 0 and len(swarm):
+            return []
+        size = min(self.wave_size(self.wave), self.max_alive - len(swarm))
+        if size <= 0:
+            return []
+        self.timer = self.interval
+        self.wave += 1
+        n = swarm.count
+        self.space.keep_out = [(player_pos.x, player_pos.y, self.safe_radius)]
+        self.space.occupy(swarm.position[:n], swarm.radius[:n])
+        points = spawn_points(size, self.space, swarm.rng, 2 * self.enemy_radius)
+        self.spawned += len(points)
+        return swarm.spawn(points, radius=self.enemy_radius)